@@ -784,13 +784,26 @@ const MakeRoutinePage = () => {
     
     // Keep track of which courses were currently locked (use current state, not previous)
     const currentlyLockedCourses = new Set(lockedCourses);
+
+    // Fetch all course details in at most two batch requests (locked courses need show_all=true)
+    const detailsByCourse = {};
+    const lockedCodes = selectedOptions.map(c => c.value).filter(code => currentlyLockedCourses.has(code));
+    const unlockedCodes = selectedOptions.map(c => c.value).filter(code => !currentlyLockedCourses.has(code));
+    for (const [codes, showAll] of [[lockedCodes, true], [unlockedCodes, false]]) {
+      if (codes.length === 0) continue;
+      try {
+        const res = await axios.get(`${API_BASE}/course_details_batch?courses=${codes.join(',')}&show_all=${showAll}`);
+        Object.assign(detailsByCourse, res.data);
+      } catch (error) {}
+    }
     
     for (const course of selectedOptions) {
       try {
         const isLocked = currentlyLockedCourses.has(course.value);
-        const res = await axios.get(`${API_BASE}/course_details?course=${course.value}&show_all=${isLocked}`);
+        const sections = detailsByCourse[course.value];
+        if (!sections) continue;
         const facultySections = {};
-        res.data.forEach(section => {
+        sections.forEach(section => {
           if (section.faculties) {
             // For locked courses, include all sections regardless of seats
             // For unlocked courses, only include sections with available seats
@@ -2411,13 +2424,13 @@ function App() {
     if (routineCourses.length > 0) {
       const fetchFaculties = async () => {
         const allFaculties = new Set();
-        for (const course of routineCourses) {
-          try {
-            const res = await axios.get(`${API_BASE}/course_details?course=${course.value}`);
-            const faculties = res.data.map(section => section.faculties).filter(Boolean);
-            faculties.forEach(f => allFaculties.add(f));
-          } catch (error) {}
-        }
+        try {
+          const codes = routineCourses.map(course => course.value).join(',');
+          const res = await axios.get(`${API_BASE}/course_details_batch?courses=${codes}`);
+          Object.values(res.data).forEach(sections => {
+            sections.map(section => section.faculties).filter(Boolean).forEach(f => allFaculties.add(f));
+          });
+        } catch (error) {}
         setRoutineFacultyOptions([...allFaculties]);
       };
       fetchFaculties();
@@ -0,0 +1,240 @@
+"""Differential check of the /api/routine solver against brute force.
+
+Builds random catalogs and requests, runs generate_routine on each, and
+compares it with a plain itertools.product enumeration that only uses the
+per-section and per-pair checks (filter_sections_by_preferences,
+is_valid_combination, check_exam_conflicts, calculate_routine_score):
+
+- a routine is returned exactly when one exists, and it is valid
+- topK returns the best scores over the distinct schedules
+- the AI path picks a routine with the fewest ("far") or most campus days
+
+Each request is solved twice, with the usual engine choice and with every
+search forced onto the backtracking engines. Run it from the repository
+root after any change to the solver:
+
+    python api/_check_routine_solver.py --catalogs 500
+
+Exits with status 1 and prints every mismatch if one is found. The leading
+underscore keeps Vercel from deploying this file as a function.
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import random
+import sys
+
+import usisvercel
+from usisvercel import (
+    CatalogSnapshot,
+    app,
+    calculate_campus_days,
+    calculate_routine_score,
+    check_exam_conflicts,
+    filter_sections_by_preferences,
+    generate_routine,
+    is_valid_combination,
+)
+
+DAYS = ["SUNDAY", "MONDAY", "TUESDAY", "WEDNESDAY", "THURSDAY", "SATURDAY"]
+SLOTS = [
+    ("08:00:00", "09:20:00"),
+    ("09:30:00", "10:50:00"),
+    ("11:00:00", "12:20:00"),
+    ("12:30:00", "13:50:00"),
+    ("14:00:00", "15:20:00"),
+    ("15:30:00", "16:50:00"),
+    ("17:00:00", "18:20:00"),
+]
+LABS = [("08:00:00", "10:50:00"), ("11:00:00", "13:50:00"), ("14:00:00", "16:50:00"), ("09:45:00", "12:35:00")]
+# Both date formats the CDN uses, naming the same days
+EXAM_DATES = [f"2025-03-{day:02d}" for day in range(1, 9)] + ["01-03-2025", "05-03-2025"]
+TIME_SLOTS = usisvercel.TIME_SLOTS
+
+
+def random_catalog(rng, courses=8, max_sections=8):
+    """Sections in the CDN's format, with labs, sold-out and look-alike sections."""
+    catalog = []
+    for course in range(courses):
+        code = f"C{course:03d}"
+        for number in range(rng.randint(1, max_sections)):
+            if catalog and catalog[-1]["courseCode"] == code and rng.random() < 0.3:
+                # Same schedule as the previous section, taught by someone else
+                section = {
+                    **catalog[-1],
+                    "sectionName": str(number + 1),
+                    "faculties": rng.choice(["AAA", "BBB", "CCC"]),
+                }
+            else:
+                first, second = rng.sample(DAYS, 2)
+                start, end = rng.choice(SLOTS)
+                section = {
+                    "courseCode": code,
+                    "courseName": f"Course {course}",
+                    "sectionName": str(number + 1),
+                    "faculties": rng.choice(["AAA", "BBB", "CCC", None]),
+                    "capacity": 30,
+                    "sectionSchedule": {
+                        "classSchedules": [
+                            {"day": first, "startTime": start, "endTime": end},
+                            {"day": second, "startTime": start, "endTime": end},
+                        ],
+                        "midExamDate": rng.choice(EXAM_DATES),
+                        "midExamStartTime": rng.choice(["09:00:00", "11:00:00"]),
+                        "midExamEndTime": rng.choice(["10:30:00", "12:30:00"]),
+                        "finalExamDate": rng.choice(EXAM_DATES + [None]),
+                        "finalExamStartTime": "09:00:00",
+                        "finalExamEndTime": "11:00:00",
+                    },
+                }
+                if rng.random() < 0.4:
+                    lab_start, lab_end = rng.choice(LABS)
+                    lab = {"day": rng.choice(DAYS), "startTime": lab_start, "endTime": lab_end}
+                    section["labSchedules"] = [lab] if rng.random() < 0.5 else {"classSchedules": [lab]}
+            section["sectionId"] = len(catalog) + 1
+            section["consumedSeat"] = rng.choice([0, 10, 10, 30])
+            catalog.append(section)
+    return catalog
+
+
+def random_request(rng, catalog):
+    codes = sorted({section["courseCode"] for section in catalog})
+    request_data = {
+        "courses": [{"course": code, "sections": {}} for code in rng.sample(codes, rng.randint(2, 4))],
+        "days": rng.sample(DAYS, rng.randint(5, 6)),
+        "times": rng.sample(TIME_SLOTS, rng.randint(5, 7)),
+        "commutePreference": rng.choice(["far", "near", "early", "late", ""]),
+    }
+    mode = rng.choice(["first", "ai", "rank"])
+    if mode == "ai":
+        request_data["useAI"] = True
+    elif mode == "rank":
+        request_data["topK"] = rng.choice([1, 3, 5])
+    return request_data
+
+
+def brute_force(snapshot, request_data):
+    """Every valid routine for the request, as section tuples in request order."""
+    selected_days = {day.upper() for day in request_data["days"]}
+    domains = []
+    for course in request_data["courses"]:
+        available = [s for s in snapshot.course_sections(course["course"]) if s.available_seats > 0]
+        domains.append(filter_sections_by_preferences(available, request_data["times"], selected_days)[0])
+    return [
+        combination
+        for combination in itertools.product(*domains)
+        if is_valid_combination(combination)
+        and not any(
+            check_exam_conflicts(first, second)
+            for first, second in itertools.combinations(combination, 2)
+        )
+    ]
+
+
+def run_solver(snapshot, request_data, exhaustive_limit):
+    """Return (status, body, combination handed to the AI step or None).
+
+    `exhaustive_limit` stands in for EXHAUSTIVE_SEARCH_LIMIT, so that small
+    catalogs can exercise the backtracking engines too.
+    """
+    handed_to_ai = []
+
+    def capture_ai(combination, *args, extra=None, **kwargs):
+        # Stands in for the Gemini call, keeping the search fields it would add
+        handed_to_ai.append(combination)
+        return usisvercel.jsonify({"routine": combination, **(extra or {})}), 200
+
+    usisvercel.catalog._snapshot = snapshot
+    usisvercel.catalog.ttl_seconds = float("inf")
+    original = usisvercel.try_ai_routine_generation, usisvercel.EXHAUSTIVE_SEARCH_LIMIT
+    usisvercel.try_ai_routine_generation = capture_ai
+    usisvercel.EXHAUSTIVE_SEARCH_LIMIT = exhaustive_limit
+    try:
+        # Keep the per-search stats line out of the report
+        with app.test_request_context("/api/routine", method="POST", json=request_data), \
+                contextlib.redirect_stdout(io.StringIO()):
+            response, status = generate_routine()
+    finally:
+        usisvercel.try_ai_routine_generation, usisvercel.EXHAUSTIVE_SEARCH_LIMIT = original
+    return status, response.get_json(), handed_to_ai[0] if handed_to_ai else None
+
+
+def check(seed):
+    """Return a list of mismatch descriptions for one random catalog and request."""
+    rng = random.Random(seed)
+    snapshot = CatalogSnapshot(1, random_catalog(rng))
+    request_data = random_request(rng, snapshot.sections)
+    routines = brute_force(snapshot, request_data)
+    problems = []
+    # Once with the configured engine choice, once with every search backtracking
+    for engines, exhaustive_limit in (("default", usisvercel.EXHAUSTIVE_SEARCH_LIMIT), ("backtracking", 0)):
+        status, body, handed_to_ai = run_solver(snapshot, request_data, exhaustive_limit)
+        problems.extend(
+            f"{engines} engines: {problem}"
+            for problem in compare(snapshot, request_data, routines, status, body, handed_to_ai)
+        )
+    return problems
+
+
+def compare(snapshot, request_data, routines, status, body, handed_to_ai):
+    """Mismatches between one solver response and the brute-force routines."""
+    if status != 200 or body.get("exhaustive") is False:
+        # Rejected input or a search cut short by its budget; nothing to compare
+        return []
+
+    by_id = {section.section_id: section for section in snapshot.compiled}
+    valid = {tuple(s.section_id for s in routine) for routine in routines}
+    problems = []
+    if "routine" not in body:
+        if routines:
+            problems.append(f"no routine returned, but {len(routines)} exist: {body.get('error')!r}")
+        return problems
+    if not routines:
+        return [f"returned a routine, but none exists: {body['routine']}"]
+
+    returned = tuple(section["sectionId"] for section in body["routine"])
+    if returned not in valid:
+        problems.append(f"returned an invalid routine {returned}")
+
+    days, times, commute = request_data["days"], request_data["times"], request_data["commutePreference"]
+    if "topK" in request_data:
+        best_by_schedule = {}
+        for routine in routines:
+            key = tuple(section.schedule_key for section in routine)
+            score = calculate_routine_score(routine, days, times, commute)
+            best_by_schedule[key] = max(score, best_by_schedule.get(key, score))
+        expected = sorted(best_by_schedule.values(), reverse=True)[: request_data["topK"]]
+        got = [entry["score"] for entry in body["routines"]]
+        if got != expected:
+            problems.append(f"topK scores {got}, expected {expected}")
+        for entry in body["routines"]:
+            ids = tuple(section["sectionId"] for section in entry["routine"])
+            if ids not in valid:
+                problems.append(f"ranked an invalid routine {ids}")
+    elif request_data.get("useAI"):
+        counts = [calculate_campus_days(routine)[0] for routine in routines]
+        expected = min(counts) if commute == "far" else max(counts)
+        picked = calculate_campus_days([by_id[s["sectionId"]] for s in handed_to_ai])[0]
+        if picked != expected:
+            problems.append(f"AI routine has {picked} campus days, expected {expected}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--catalogs", type=int, default=500, help="how many random catalogs to try")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first catalog")
+    args = parser.parse_args()
+
+    failures = 0
+    for seed in range(args.seed, args.seed + args.catalogs):
+        for problem in check(seed):
+            failures += 1
+            print(f"seed {seed}: {problem}")
+    print(f"{args.catalogs} catalogs checked, {failures} mismatches")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,29 +1,54 @@
 import requests
-from flask import Flask, jsonify, request, send_file, abort
+from requests.adapters import HTTPAdapter
+from flask import Flask, Response, jsonify, request, send_file, abort
 from flask_cors import CORS
 import re
 from datetime import datetime, timezone, timedelta
 import json
+import gzip
+import hashlib
 import pytz
 import demjson3
 import json as pyjson
 import os
 from itertools import product
+from functools import lru_cache
+from collections import OrderedDict, deque
 import time
+import threading
 import traceback
 import logging
 import itertools
+import heapq
 import google.generativeai as genai
 from google.generativeai.types import HarmCategory, HarmBlockThreshold
 
 # Global debug flag - set to True for development, False for production
 DEBUG = False
 
+# Allow tracing a single request with the "X-Debug-Trace: 1" header
+REQUEST_TRACING = os.environ.get("REQUEST_TRACING", "").lower() in ("1", "true", "yes")
+
+# Per-thread switch set for the request currently handled by this thread
+_trace_state = threading.local()
+
+
+def tracing():
+    """Return True when debug output is on globally or for the current request."""
+    return DEBUG or getattr(_trace_state, "enabled", False)
+
+
 def debugprint(*args, **kwargs):
-    """Print debug messages only when DEBUG is True"""
-    if DEBUG:
+    """Print debug messages only when tracing is on (DEBUG or a traced request)"""
+    if tracing():
         print(*args, **kwargs)
 
+
+def trace(message, *args):
+    """Lazy debugprint for hot paths: `message % args` is only formatted when tracing is on."""
+    if tracing():
+        print(message % args if args else message)
+
 debugprint("\n=== Loading Environment Variables ===")
 # Debug: Print all environment variables
 debugprint("Available environment variables:", list(os.environ.keys()))
@@ -40,6 +65,41 @@ CORS(app)  # Enable CORS for all routes
 log = logging.getLogger('werkzeug')
 log.setLevel(logging.ERROR)
 
+
+@app.before_request
+def start_request_trace():
+    _trace_state.enabled = REQUEST_TRACING and request.headers.get("X-Debug-Trace") == "1"
+
+
+@app.teardown_request
+def end_request_trace(exc):
+    # Waitress reuses threads, so never let the flag leak into the next request
+    _trace_state.enabled = False
+
+# Advertise brotli only when urllib3 can decode it
+try:
+    import brotli
+    HTTP_ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    brotli = None
+    HTTP_ACCEPT_ENCODING = "gzip, deflate"
+
+# Upper bound on keep-alive connections kept open per host
+HTTP_POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", "10"))
+
+
+def create_http_session():
+    """Create the shared, thread-safe session used for all outbound catalog traffic."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_MAXSIZE, pool_block=True)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Accept-Encoding": HTTP_ACCEPT_ENCODING, "Connection": "keep-alive"})
+    return session
+
+
+http_session = create_http_session()
+
 # Configure Gemini API
 gemini_configured = False
 try:
@@ -75,7 +135,7 @@ def check_ai_availability():
 @app.route("/api/connapi-status")
 def check_connapi_status():
     try:
-        response = requests.get("https://usis-cdn.eniamza.com/connect.json", timeout=30)
+        response = http_session.get(CATALOG_URL, timeout=30)
         response.raise_for_status()  # This will raise an exception for HTTP errors
         data = response.json()
         
@@ -121,46 +181,386 @@ def test():
 @app.route("/api/courses")
 def get_courses():
     try:
-        # Get show_all parameter from query string, default to False
-        show_all = request.args.get("show_all", "false").lower() == "true"
-        
-        data = load_data()  # Load data directly in the route
-        if data is None:
+        # show_all does not change the list: every course is returned and
+        # hasAvailableSeats lets the frontend grey out full ones
+        snapshot = catalog.get()
+        if snapshot is None:
             return jsonify({"error": "Failed to load course data. Please try again later."}), 503
-            
-        courses_data = {}
-        for section in data:
-            code = section.get("courseCode")
-            name = section.get("courseName", code)
-            available_seats = section.get("capacity", 0) - section.get("consumedSeat", 0)
-            
-            # Always process the course and include it in the response
-            if code not in courses_data:
-                courses_data[code] = {
-                    "code": code, 
-                    "name": name, 
-                    "totalAvailableSeats": 0,
-                    "hasAvailableSeats": False  # Add flag to indicate if course has any seats
-                }
-            courses_data[code]["totalAvailableSeats"] += available_seats
-            if available_seats > 0:
-                courses_data[code]["hasAvailableSeats"] = True
-                
-        courses_list = list(courses_data.values())
-        return jsonify(courses_list)
+
+        # Aggregated and serialized once per catalog snapshot
+        return send_prepared(snapshot.courses_payload)
     except Exception as e:
         print(f"Error in /api/courses: {e}")
         return jsonify({"error": "Failed to process courses data. Please try again later."}), 503
 
 
+def build_courses_list(sections):
+    """Aggregate sections into one entry per course with its total available seats."""
+    courses_data = {}
+    for section in sections:
+        code = section.get("courseCode")
+        name = section.get("courseName", code)
+        available_seats = section.get("capacity", 0) - section.get("consumedSeat", 0)
+
+        # Always process the course and include it in the response
+        if code not in courses_data:
+            courses_data[code] = {
+                "code": code,
+                "name": name,
+                "totalAvailableSeats": 0,
+                "hasAvailableSeats": False  # Add flag to indicate if course has any seats
+            }
+        courses_data[code]["totalAvailableSeats"] += available_seats
+        if available_seats > 0:
+            courses_data[code]["hasAvailableSeats"] = True
+
+    return list(courses_data.values())
+
+
 # Initialize data as None
 data = None
 
+# Course catalog source and how long a loaded copy is served before a refresh
+CATALOG_URL = "https://usis-cdn.eniamza.com/connect.json"
+CATALOG_TTL_SECONDS = float(os.environ.get("CATALOG_TTL_SECONDS", "60"))
+# How many (course, course) blocks of the compatibility matrix each snapshot keeps
+COMPAT_CACHE_PAIRS = int(os.environ.get("COMPAT_CACHE_PAIRS", "2048"))
+# How many course_details_batch responses (course list, show_all) each snapshot keeps
+BATCH_PAYLOAD_CACHE_SIZE = int(os.environ.get("BATCH_PAYLOAD_CACHE_SIZE", "256"))
+
+
+class CatalogSnapshot:
+    """One loaded catalog: raw sections, compiled Sections, indexes and prepared payloads.
+
+    Shared between threads; only the validators and the lazily filled payload caches change after construction.
+    """
+
+    __slots__ = (
+        "version",
+        "sections",
+        "compiled",
+        "by_course",
+        "by_faculty",
+        "by_course_section",
+        "by_id",
+        "courses_payload",
+        "details_by_course",
+        "details_payloads",
+        "batch_payloads",
+        "_batch_lock",
+        "exams",
+        "compat",
+        "loaded_at",
+        "etag",
+        "last_modified",
+        "content_hash",
+    )
+
+    def __init__(self, version, sections, etag=None, last_modified=None, content_hash=None):
+        self.version = version
+        self.sections = tuple(sections)
+        self.compiled = tuple(compile_section(section) for section in self.sections)
+        self._build_indexes()
+        self.courses_payload = PreparedPayload(build_courses_list(self.sections))
+        self.details_by_course = {
+            code: tuple(build_section_details(section.raw) for section in sections)
+            for code, sections in self.by_course.items()
+        }
+        # Filled lazily by course_details_payload() and course_details_batch_payload()
+        self.details_payloads = {}
+        self.batch_payloads = OrderedDict()
+        self._batch_lock = threading.Lock()
+        self.exams = ExamIndex(self.by_course)
+        self.compat = CompatibilityMatrix(self.by_course, self.exams, COMPAT_CACHE_PAIRS)
+        self.loaded_at = time.monotonic()
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_hash = content_hash
+
+    def _build_indexes(self):
+        by_course = {}
+        by_faculty = {}
+        by_course_section = {}
+        by_id = {}
+        for section in self.compiled:
+            by_course.setdefault(section.course_code, []).append(section)
+            if section.faculty:
+                by_faculty.setdefault(section.faculty, []).append(section)
+            # First match wins, like the linear scans these replace
+            by_course_section.setdefault((section.course_code, str(section.section_name)), section)
+            if section.section_id is not None:
+                by_id.setdefault(section.section_id, section)
+        self.by_course = {code: tuple(sections) for code, sections in by_course.items()}
+        for sections in self.by_course.values():
+            for index, section in enumerate(sections):
+                section.course_index = index
+        self.by_faculty = {faculty: tuple(sections) for faculty, sections in by_faculty.items()}
+        self.by_course_section = by_course_section
+        self.by_id = by_id
+
+    def course_sections(self, course_code):
+        """Return the compiled sections of one course in catalog order."""
+        return self.by_course.get(course_code, ())
+
+    def course_details(self, course_code):
+        """Return the display-ready section dicts of one course in catalog order."""
+        return self.details_by_course.get(course_code, ())
+
+    def course_details_payload(self, course_code, show_all):
+        """Return the prepared course_details response for one course and show_all value."""
+        key = (course_code, show_all)
+        prepared = self.details_payloads.get(key)
+        if prepared is None:
+            details = [
+                section for section in self.course_details(course_code)
+                if show_all or section["availableSeats"] > 0  # Include all sections if show_all is true
+            ]
+            if course_code not in self.details_by_course:
+                # Don't cache arbitrary unknown codes
+                return PreparedPayload(details)
+            # Concurrent first requests may both build it; either result is identical
+            prepared = self.details_payloads.setdefault(key, PreparedPayload(details))
+        return prepared
+
+    def course_details_batch_payload(self, course_codes, show_all):
+        """Return the prepared course_details_batch response for a list of course codes (LRU cached)."""
+        # dict.fromkeys drops duplicate codes but keeps request order
+        key = (tuple(dict.fromkeys(course_codes)), show_all)
+        with self._batch_lock:
+            prepared = self.batch_payloads.get(key)
+            if prepared is not None:
+                self.batch_payloads.move_to_end(key)
+                return prepared
+        # Built outside the lock; a concurrent duplicate build gives the same body
+        body = b"{" + b",".join(
+            json.dumps(code).encode("utf-8") + b":" + self.course_details_payload(code, show_all).body.rstrip(b"\n")
+            for code in key[0]
+        ) + b"}\n"
+        prepared = PreparedPayload.from_body(body)
+        if all(code in self.details_by_course for code in key[0]):
+            # Don't cache arbitrary unknown codes
+            with self._batch_lock:
+                self.batch_payloads[key] = prepared
+                while len(self.batch_payloads) > BATCH_PAYLOAD_CACHE_SIZE:
+                    self.batch_payloads.popitem(last=False)
+        return prepared
+
+    def is_stale(self, ttl_seconds):
+        return time.monotonic() - self.loaded_at >= ttl_seconds
+
+    def revalidated(self, etag=None, last_modified=None):
+        """Mark the snapshot fresh again after the CDN confirmed it is unchanged."""
+        self.etag = etag or self.etag
+        self.last_modified = last_modified or self.last_modified
+        self.loaded_at = time.monotonic()
+        return self
+
+
+class PreparedPayload:
+    """A JSON response body serialized once, with gzip and (if available) brotli variants."""
+
+    __slots__ = ("body", "encoded", "etag")
+
+    def __init__(self, payload):
+        # Same compact, key-sorted form jsonify produces
+        self._prepare((json.dumps(payload, separators=(",", ":"), sort_keys=True) + "\n").encode("utf-8"))
+
+    @classmethod
+    def from_body(cls, body):
+        """Prepare a body that is already serialized JSON."""
+        prepared = cls.__new__(cls)
+        prepared._prepare(body)
+        return prepared
+
+    def _prepare(self, body):
+        self.body = body
+        self.etag = '"' + hashlib.sha256(self.body).hexdigest()[:32] + '"'
+        self.encoded = {"gzip": gzip.compress(self.body, compresslevel=6)}
+        if brotli is not None:
+            self.encoded["br"] = brotli.compress(self.body, quality=5)
+
+
+def accepted_encodings():
+    """Return the content codings the client accepts (ignoring q-values other than q=0)."""
+    accepted = set()
+    for part in request.headers.get("Accept-Encoding", "").split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        if coding and params.replace(" ", "").lower() not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(coding)
+    return accepted
+
+
+def etag_matches(etag):
+    """Check the request's If-None-Match header against an ETag (weak comparison)."""
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in header.split(","))
+    return any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in candidates)
+
+
+def send_prepared(prepared):
+    """Send a PreparedPayload in the best encoding the client accepts, or 304 if it is current."""
+    # no-cache: browsers may store the body but must revalidate it each time
+    headers = {"Vary": "Accept-Encoding", "ETag": prepared.etag, "Cache-Control": "no-cache"}
+    if etag_matches(prepared.etag):
+        return Response(status=304, headers=headers)
+
+    accepted = accepted_encodings()
+    body = prepared.body
+    for coding in ("br", "gzip"):
+        if coding in prepared.encoded and coding in accepted:
+            body = prepared.encoded[coding]
+            headers["Content-Encoding"] = coding
+            break
+    return Response(body, status=200, headers=headers, mimetype="application/json")
+
+
+class CatalogFetch:
+    """Outcome of one catalog download attempt."""
+
+    __slots__ = ("changed", "sections", "etag", "last_modified", "content_hash")
+
+    def __init__(self, changed, sections=None, etag=None, last_modified=None, content_hash=None):
+        self.changed = changed
+        self.sections = sections
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_hash = content_hash
+
+
+class SingleFlight:
+    """Run a function once for all concurrent callers and share its result."""
+
+    class _Call:
+        __slots__ = ("done", "result", "error")
+
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._call = None
+
+    def do(self, fn):
+        with self._lock:
+            call = self._call
+            leader = call is None
+            if leader:
+                call = self._call = SingleFlight._Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._call = None
+            call.done.set()
+        return call.result
+
+
+class CatalogStore:
+    """Process-wide holder of the current catalog snapshot, refreshed stale-while-revalidate."""
+
+    def __init__(self, ttl_seconds):
+        self.ttl_seconds = ttl_seconds
+        self._snapshot = None
+        self._version = 0
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._flight = SingleFlight()
+
+    def get(self):
+        """Return the current snapshot, loading it synchronously on first use."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return self.refresh()
+        if snapshot.is_stale(self.ttl_seconds):
+            self._schedule_refresh()
+        return snapshot
+
+    def refresh(self):
+        """Load the catalog now and swap it in. Keeps the old snapshot on failure."""
+        return self._flight.do(self._load)
+
+    def _load(self):
+        current = self._snapshot
+        result = fetch_catalog(current)
+        if result is None:
+            return current
+        if not result.changed and current is not None:
+            debugprint(f"Catalog unchanged, keeping snapshot v{current.version}")
+            return current.revalidated(result.etag, result.last_modified)
+        # Building compiles every section and its payloads, so do it outside
+        # the lock; requests keep getting the current snapshot meanwhile.
+        # Loads are single-flight, so nobody else bumps the version in between
+        snapshot = CatalogSnapshot(
+            self._version + 1,
+            result.sections,
+            etag=result.etag,
+            last_modified=result.last_modified,
+            content_hash=result.content_hash,
+        )
+        with self._lock:
+            self._version = snapshot.version
+            self._snapshot = snapshot
+        debugprint(f"Catalog snapshot v{snapshot.version} installed ({len(result.sections)} sections)")
+        return snapshot
+
+    def _schedule_refresh(self):
+        if self._refreshing:
+            return
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, name="catalog-refresh", daemon=True).start()
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"Error refreshing course catalog: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+
+catalog = CatalogStore(CATALOG_TTL_SECONDS)
+
+
 def load_data():
+    """Return the section list of the current catalog snapshot, or None if it could not be loaded."""
+    snapshot = catalog.get()
+    return snapshot.sections if snapshot else None
+
+
+def fetch_catalog(current=None):
+    """Download and parse the catalog from the CDN, retrying on failure. Returns None when every attempt failed."""
+    headers = {}
+    if current is not None:
+        if current.etag:
+            headers["If-None-Match"] = current.etag
+        if current.last_modified:
+            headers["If-Modified-Since"] = current.last_modified
+
     try:
-        DATA_URL = "https://usis-cdn.eniamza.com/connect.json"  # Using Vercel deployment
+        DATA_URL = CATALOG_URL
         debugprint(f"\n=== Loading Fresh Data from {DATA_URL} ===")
-        
+
         # Add retry logic
         max_retries = 3
         retry_delay = 2  # seconds
@@ -168,9 +568,26 @@ def load_data():
         for attempt in range(max_retries):
             try:
                 debugprint(f"Attempt {attempt + 1}/{max_retries}...")
-                response = requests.get(DATA_URL, timeout=30)  # Increased timeout
+                response = http_session.get(DATA_URL, headers=headers, timeout=30)  # Increased timeout
+                if response.status_code == 304 and current is not None:
+                    debugprint("Catalog not modified (304)")
+                    return CatalogFetch(
+                        False,
+                        etag=response.headers.get("ETag"),
+                        last_modified=response.headers.get("Last-Modified"),
+                    )
                 response.raise_for_status()
-                raw_json = response.json()
+
+                body = response.content
+                content_hash = hashlib.sha256(body).hexdigest()
+                if current is not None and content_hash == current.content_hash:
+                    debugprint("Catalog body unchanged, skipping parse")
+                    return CatalogFetch(
+                        False,
+                        etag=response.headers.get("ETag"),
+                        last_modified=response.headers.get("Last-Modified"),
+                    )
+                raw_json = json.loads(body)
                 
                 debugprint(f"Raw response type: {type(raw_json)}")
                 
@@ -198,7 +615,13 @@ def load_data():
                 for course, count in sorted(course_counts.items()):
                     debugprint(f"  {course}: {count} sections")
                 
-                return fresh_data
+                return CatalogFetch(
+                    True,
+                    fresh_data,
+                    etag=response.headers.get("ETag"),
+                    last_modified=response.headers.get("Last-Modified"),
+                    content_hash=content_hash,
+                )
             except requests.exceptions.RequestException as e:
                 debugprint(f"Error on attempt {attempt + 1}: {e}")
                 if attempt < max_retries - 1:  # Don't sleep on the last attempt
@@ -211,7 +634,7 @@ def load_data():
         debugprint("All retry attempts failed")
         return None
     except Exception as e:
-        debugprint(f"Critical error in load_data: {e}")
+        debugprint(f"Critical error in fetch_catalog: {e}")
         return None
 
 
@@ -219,6 +642,56 @@ def load_data():
 BD_TIMEZONE = pytz.timezone("Asia/Dhaka")
 
 
+# Bound for the memoized parsers below. The catalog only uses a few dozen
+# distinct time strings, so this is never reached in practice.
+TIME_PARSE_CACHE_SIZE = 4096
+
+# "08:00:00", "8:00", "8", "8:00 AM", "8:00:00 PM", "8AM", ...
+_TIME_OF_DAY = re.compile(r"(\d{1,2})(?::(\d{1,2}))?(?::(\d{1,2}))?\s*([AP]M)?")
+
+
+@lru_cache(maxsize=TIME_PARSE_CACHE_SIZE)
+def _strptime_or_none(text, fmt):
+    try:
+        return datetime.strptime(text, fmt)
+    except ValueError:
+        return None
+
+
+def parse_clock(text, fmt):
+    """Memoized drop-in for datetime.strptime with one fixed format (dates, display conversions)."""
+    result = _strptime_or_none(text, fmt)
+    if result is None:
+        raise ValueError(f"time data {text!r} does not match format {fmt!r}")
+    return result
+
+
+@lru_cache(maxsize=TIME_PARSE_CACHE_SIZE)
+def parse_time_of_day(text):
+    """Parse a 24-hour or AM/PM clock time into (hour, minute, second), or None."""
+    if not isinstance(text, str):
+        return None
+    match = _TIME_OF_DAY.fullmatch(text.strip().upper())
+    if match is None:
+        return None
+    hour, minute, second, meridiem = match.groups()
+    hour, minute, second = int(hour), int(minute or 0), int(second or 0)
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem == "PM" else 0)
+    elif hour > 23:
+        return None
+    if minute > 59 or second > 59:
+        return None
+    return hour, minute, second
+
+
+def _minutes_or_zero(text):
+    parsed = parse_time_of_day(text)
+    return parsed[0] * 60 + parsed[1] if parsed else 0
+
+
 # Create TimeUtils class
 class TimeUtils:
     @staticmethod
@@ -226,7 +699,7 @@ class TimeUtils:
         """Convert time string to Bangladesh timezone."""
         debugprint(f"Converting time to Bangladesh timezone: {time_str}")
         try:
-            time_obj = datetime.strptime(time_str, "%H:%M:%S").time()
+            time_obj = parse_clock(time_str, "%H:%M:%S").time()
             dt = datetime.now().replace(
                 hour=time_obj.hour,
                 minute=time_obj.minute,
@@ -245,50 +718,11 @@ class TimeUtils:
     def time_to_minutes(tstr):
         """Convert time string to minutes (handles both 24-hour and 12-hour formats)."""
         if not tstr:
-            debugprint(f"Warning: Empty time string")
-            return 0
-
-        tstr = tstr.strip().upper()
-        debugprint(f"Converting time to minutes: {tstr}")
-
-        try:
-            if "AM" in tstr or "PM" in tstr:
-                if ":" not in tstr:
-                    tstr = tstr.replace(" ", ":00 ")
-                tstr = re.sub(r":\d+\s*(AM|PM)", r" \1", tstr)
-                try:
-                    dt = datetime.strptime(tstr, "%I:%M %p")
-                    minutes = dt.hour * 60 + dt.minute
-                    debugprint(f"Converted {tstr} to {minutes} minutes (12-hour format)")
-                    return minutes
-                except ValueError:
-                    try:
-                        dt = datetime.strptime(tstr, "%I %p")
-                        minutes = dt.hour * 60 + dt.minute
-                        debugprint(f"Converted {tstr} to {minutes} minutes (12-hour short format)")
-                        return minutes
-                    except ValueError:
-                        debugprint(f"Warning: Could not parse time string: {tstr}")
-                        return 0
-            else:
-                try:
-                    dt = datetime.strptime(tstr, "%H:%M:%S")
-                    minutes = dt.hour * 60 + dt.minute
-                    debugprint(f"Converted {tstr} to {minutes} minutes (24-hour format)")
-                    return minutes
-                except ValueError:
-                    try:
-                        dt = datetime.strptime(tstr, "%H:%M")
-                        minutes = dt.hour * 60 + dt.minute
-                        debugprint(f"Converted {tstr} to {minutes} minutes (24-hour short format)")
-                        return minutes
-                    except ValueError:
-                        debugprint(f"Warning: Could not parse time string: {tstr}")
-                        return 0
-
-        except Exception as e:
-            debugprint(f"Error converting time to minutes: {e}")
+            trace("Warning: Empty time string")
             return 0
+        minutes = _minutes_or_zero(tstr)
+        trace("Converted %s to %s minutes", tstr, minutes)
+        return minutes
 
     @staticmethod
     def minutes_to_time(minutes):
@@ -374,19 +808,19 @@ class ExamConflictChecker:
 
 # Helper function to format 24-hour time string to 12-hour AM/PM
 def convert_time_24_to_12(text):
-    debugprint(f"Converting 24-hour time to 12-hour format: {text}")
+    trace("Converting 24-hour time to 12-hour format: %s", text)
     def repl(match):
         t = match.group(0)
         t = t[:5]
-        debugprint(f"Processing time match: {t}")
-        in_time = datetime.strptime(t, "%H:%M")
+        trace("Processing time match: %s", t)
+        in_time = parse_clock(t, "%H:%M")
         # Use %#I for Windows, %-I for others
         result = in_time.strftime("%#I:%M %p")
-        debugprint(f"Converted {t} to {result}")
+        trace("Converted %s to %s", t, result)
         return result
 
     result = re.sub(r"\b([01]\d|2[0-3]):[0-5]\d(?::[0-5]\d)?\b", repl, text)
-    debugprint(f"Final result: {result}")
+    trace("Final result: %s", result)
     return result
 
 
@@ -403,39 +837,34 @@ TIME_SLOTS = [
 
 
 def parse_time(tstr):
-    debugprint(f"Parsing time string: {tstr}")
-    try:
-        result = datetime.strptime(tstr, "%I:%M %p")
-        debugprint(f"Parsed {tstr} to datetime object")
-        return result
-    except Exception as e:
-        debugprint(f"Error parsing time string: {e}")
+    trace("Parsing time string: %s", tstr)
+    parsed = parse_time_of_day(tstr)
+    if parsed is None:
+        trace("Could not parse time string: %s", tstr)
         return None
+    # Same value datetime.strptime gives for a bare time
+    return datetime(1900, 1, 1, *parsed)
 
 
 def slot_to_minutes(slot):
-    debugprint(f"Converting time slot to minutes: {slot}")
+    trace("Converting time slot to minutes: %s", slot)
     try:
         start_str, end_str = slot.split("-")
-        start = parse_time(start_str.strip())
-        end = parse_time(end_str.strip())
-        if start is None or end is None:
-            debugprint("Failed to parse start or end time")
-            return 0, 0
-        start_minutes = start.hour * 60 + start.minute
-        end_minutes = end.hour * 60 + end.minute
-        debugprint(f"Converted {slot} to minutes: {start_minutes}-{end_minutes}")
-        return start_minutes, end_minutes
-    except Exception as e:
-        debugprint(f"Error converting time slot to minutes: {e}")
+    except (AttributeError, ValueError) as e:
+        trace("Error converting time slot to minutes: %s", e)
         return 0, 0
+    start = parse_time_of_day(start_str)
+    end = parse_time_of_day(end_str)
+    if start is None or end is None:
+        debugprint("Failed to parse start or end time")
+        return 0, 0
+    return start[0] * 60 + start[1], end[0] * 60 + end[1]
 
 
 def schedules_overlap(start1, end1, start2, end2):
     """Check if two time ranges overlap."""
     overlap = max(start1, start2) < min(end1, end2)
-    debugprint(f"=== STEP 2: Checking Time Conflicts ===")
-    debugprint(f"Checking overlap between {start1}-{end1} and {start2}-{end2}: {'Overlap found' if overlap else 'No overlap'}")
+    trace("Checking overlap between %s-%s and %s-%s: %s", start1, end1, start2, end2, 'Overlap found' if overlap else 'No overlap')
     return overlap
 
 
@@ -447,12 +876,12 @@ def normalize_date(date_str):
         # Try parsing common date formats
         for fmt in ["%Y-%m-%d", "%d-%m-%Y", "%Y/%m/%d", "%d/%m/%Y"]:
             try:
-                return datetime.strptime(date_str, fmt).strftime("%Y-%m-%d")
+                return parse_clock(date_str, fmt).strftime("%Y-%m-%d")
             except ValueError:
                 continue
         return None
     except Exception as e:
-        debugprint(f"Error normalizing date: {e}")
+        trace("Error normalizing date: %s", e)
         return None
 
 def exam_schedules_overlap(exam1, exam2):
@@ -461,7 +890,7 @@ def exam_schedules_overlap(exam1, exam2):
         # Convert times to minutes for comparison
         def convert_time(time_str):
             if not isinstance(time_str, str):
-                debugprint(f"Warning: Invalid time format: {time_str}")
+                trace("Warning: Invalid time format: %s", time_str)
                 return None
                 
             # Remove any extra whitespace
@@ -472,7 +901,7 @@ def exam_schedules_overlap(exam1, exam2):
                 hours, minutes, _ = time_str.split(':')
                 return int(hours) * 60 + int(minutes)
             except ValueError:
-                debugprint(f"Error converting time: {time_str}")
+                trace("Error converting time: %s", time_str)
                 return None
 
         # Get dates and times
@@ -484,7 +913,7 @@ def exam_schedules_overlap(exam1, exam2):
             return False
         
         if date1 != date2:
-            debugprint(f"Different dates: {date1} vs {date2}")
+            trace("Different dates: %s vs %s", date1, date2)
             return False
             
         time1 = convert_time(exam1.get("time"))
@@ -502,255 +931,152 @@ def exam_schedules_overlap(exam1, exam2):
         end_time2 = time2 + exam_duration
         
         overlap = max(time1, time2) < min(end_time1, end_time2)
-        debugprint(f"Checking exam overlap: {time1}-{end_time1} vs {time2}-{end_time2}: {'Overlap' if overlap else 'No overlap'}")
+        trace("Checking exam overlap: %s-%s vs %s-%s: %s", time1, end_time1, time2, end_time2, 'Overlap' if overlap else 'No overlap')
         return overlap
         
     except Exception as e:
-        debugprint(f"Error comparing exam schedules: {e}")
+        trace("Error comparing exam schedules: %s", e)
         return False  # Return False to be safe if there's an error
 
 
 def check_exam_conflicts(section1, section2):
-    """Check for exam conflicts between two sections."""
-    conflicts = []
+    """Check for exam conflicts between two sections (mid vs mid, final vs final)."""
+    section1 = as_section(section1)
+    section2 = as_section(section2)
 
     # Skip comparison if sections are the same
-    if section1.get("sectionId") == section2.get("sectionId"):
+    if section1.section_id == section2.section_id:
         return []
 
-    # Get exam schedules
-    schedule1 = section1.get("sectionSchedule", {})
-    schedule2 = section2.get("sectionSchedule", {})
-
-    # Check midterm exam conflicts
-    if schedule1.get("midExamDate") and schedule2.get("midExamDate"):
-        if normalize_date(schedule1["midExamDate"]) == normalize_date(schedule2["midExamDate"]):
-            print(f"\nChecking midterm exam conflict for {schedule1['midExamDate']}:")
-            print(f"{section1.get('courseCode')} vs {section2.get('courseCode')}")
-            
-            exam1 = {
-                "start": schedule1.get("midExamStartTime", "").replace(" ", ""),
-                "end": schedule1.get("midExamEndTime", "").replace(" ", "")
-            }
-            exam2 = {
-                "start": schedule2.get("midExamStartTime", "").replace(" ", ""),
-                "end": schedule2.get("midExamEndTime", "").replace(" ", "")
-            }
-            
-            if exam_schedules_overlap(exam1, exam2):
-                conflicts.append({
-                    "course1": section1.get("courseCode"),
-                    "course2": section2.get("courseCode"),
-                    "type1": "Mid",
-                    "type2": "Mid",
-                    "date": schedule1["midExamDate"],
-                    "time1": f"{schedule1.get('midExamStartTime')} - {schedule1.get('midExamEndTime')}",
-                    "time2": f"{schedule2.get('midExamStartTime')} - {schedule2.get('midExamEndTime')}"
-                })
-
-    # Check final exam conflicts
-    if schedule1.get("finalExamDate") and schedule2.get("finalExamDate"):
-        if normalize_date(schedule1["finalExamDate"]) == normalize_date(schedule2["finalExamDate"]):
-            print(f"\nChecking final exam conflict for {schedule1['finalExamDate']}:")
-            print(f"{section1.get('courseCode')} vs {section2.get('courseCode')}")
-            
-            exam1 = {
-                "start": schedule1.get("finalExamStartTime", "").replace(" ", ""),
-                "end": schedule1.get("finalExamEndTime", "").replace(" ", "")
-            }
-            exam2 = {
-                "start": schedule2.get("finalExamStartTime", "").replace(" ", ""),
-                "end": schedule2.get("finalExamEndTime", "").replace(" ", "")
-            }
-            
-            if exam_schedules_overlap(exam1, exam2):
-                conflicts.append({
-                    "course1": section1.get("courseCode"),
-                    "course2": section2.get("courseCode"),
-                    "type1": "Final",
-                    "type2": "Final",
-                    "date": schedule1["finalExamDate"],
-                    "time1": f"{schedule1.get('finalExamStartTime')} - {schedule1.get('finalExamEndTime')}",
-                    "time2": f"{schedule2.get('finalExamStartTime')} - {schedule2.get('finalExamEndTime')}"
-                })
-
+    conflicts = []
+    for exam1, exam2 in section1.exam_clashes(section2):
+        trace("%s exam conflict on %s: %s vs %s", exam1.kind, exam1.date, section1.course_code, section2.course_code)
+        conflicts.append({
+            "course1": section1.course_code,
+            "course2": section2.course_code,
+            "type1": exam1.kind,
+            "type2": exam2.kind,
+            "date": exam1.raw_date,
+            "time1": f"{exam1.start_time} - {exam1.end_time}",
+            "time2": f"{exam2.start_time} - {exam2.end_time}"
+        })
     return conflicts
 
 
-def has_internal_conflicts(section):
-    """Check if a single section has overlapping class or lab schedules."""
-    debugprint(f"\nChecking internal conflicts for section {section.get('courseCode')} {section.get('sectionName')}")
-    schedules = []
-    if section.get("sectionSchedule") and section["sectionSchedule"].get(
-        "classSchedules"
+def build_section_details(section):
+    """Return a copy of a catalog section with the display fields course_details adds."""
+    details = dict(section)
+    details["availableSeats"] = section.get("capacity", 0) - section.get("consumedSeat", 0)
+
+    # Add exam information - Prioritize data from sectionSchedule
+    section_schedule = section.get("sectionSchedule") or {}
+    for field in (
+        "midExamDate",
+        "midExamStartTime",
+        "midExamEndTime",
+        "finalExamDate",
+        "finalExamStartTime",
+        "finalExamEndTime",
     ):
-        debugprint("Processing class schedules")
-        for sched in section["sectionSchedule"]["classSchedules"]:
-            if sched.get("day") and sched.get("startTime") and sched.get("endTime"):
-                schedule = {
-                    "day": sched["day"].upper(),
-                    "start": TimeUtils.time_to_minutes(sched["startTime"]),
-                    "end": TimeUtils.time_to_minutes(sched["endTime"]),
-                }
-                schedules.append(schedule)
-                debugprint(f"Added class schedule: {sched['day']} {sched['startTime']}-{sched['endTime']}")
+        details[field] = section_schedule.get(field) or section.get(field)
 
-    if section.get("labSchedules"):
-        debugprint("Processing lab schedules")
-        for lab in get_lab_schedules_flat(section):
-            if lab.get("day") and lab.get("startTime") and lab.get("endTime"):
-                schedule = {
-                    "day": lab["day"].upper(),
-                    "start": TimeUtils.time_to_minutes(lab["startTime"]),
-                    "end": TimeUtils.time_to_minutes(lab["endTime"]),
-                }
-                schedules.append(schedule)
-                debugprint(f"Added lab schedule: {lab['day']} {lab['startTime']}-{lab['endTime']}")
-
-    debugprint(f"Found {len(schedules)} total schedules")
-
-    # Check for conflicts among all schedules in this section
-    for i in range(len(schedules)):
-        for j in range(i + 1, len(schedules)):
-            if schedules[i]["day"] == schedules[j]["day"]:
-                debugprint(f"Checking overlap for {schedules[i]['day']}:")
-                debugprint(f"Schedule 1: {TimeUtils.minutes_to_time(schedules[i]['start'])}-{TimeUtils.minutes_to_time(schedules[i]['end'])}")
-                debugprint(f"Schedule 2: {TimeUtils.minutes_to_time(schedules[j]['start'])}-{TimeUtils.minutes_to_time(schedules[j]['end'])}")
-                if schedules_overlap(
-                    schedules[i]["start"],
-                    schedules[i]["end"],
-                    schedules[j]["start"],
-                    schedules[j]["end"],
-                ):
-                    debugprint("Found internal conflict!")
-                    return True
-                else:
-                    debugprint("No overlap found")
+    # Optional: Add formatted exam times (12-hour AM/PM) using the
+    # prioritized times
+    if details["midExamStartTime"] and details["midExamEndTime"]:
+        details["formattedMidExamTime"] = convert_time_24_to_12(
+            f"{details['midExamStartTime']} - {details['midExamEndTime']}"
+        )
+    else:
+        details["formattedMidExamTime"] = None
 
-    debugprint("No internal conflicts found")
-    return False
+    if details["finalExamStartTime"] and details["finalExamEndTime"]:
+        details["formattedFinalExamTime"] = convert_time_24_to_12(
+            f"{details['finalExamStartTime']} - {details['finalExamEndTime']}"
+        )
+    else:
+        details["formattedFinalExamTime"] = None
+
+    # Format schedule information
+    if section_schedule:
+        class_schedules = section_schedule.get("classSchedules")
+        if isinstance(class_schedules, list):
+            details["sectionSchedule"] = {
+                **section_schedule,
+                "classSchedules": [_with_formatted_time(schedule) for schedule in class_schedules],
+            }
+
+    # Format lab schedule information
+    lab_schedules = section.get("labSchedules")
+    if isinstance(lab_schedules, list):
+        details["labSchedules"] = [_with_formatted_time(schedule) for schedule in lab_schedules]
+
+    return details
+
+
+def _with_formatted_time(schedule):
+    return {
+        **schedule,
+        "formattedTime": convert_time_24_to_12(f"{schedule.get('startTime')} - {schedule.get('endTime')}"),
+    }
 
 
 @app.route("/api/course_details")
 def course_details():
-    data = load_data()
+    snapshot = catalog.get()
+    if snapshot is None:
+        return jsonify({"error": "Failed to load course data. Please try again later."}), 503
     code = request.args.get("course")
     show_all = request.args.get("show_all", "false").lower() == "true"  # Get show_all parameter
-    
+
     debugprint(f"\n=== Getting Course Details for {code} ===")
     debugprint(f"Show All: {show_all}")
-    
-    # Get all sections for the course
-    all_sections = [section for section in data if section.get("courseCode") == code]
-    debugprint(f"Found {len(all_sections)} total sections for {code}")
-
-    # Filter sections based on show_all parameter
-    details = []
-    for section in all_sections:
-        available_seats = section.get("capacity", 0) - section.get("consumedSeat", 0)
-        if show_all or available_seats > 0:  # Include all sections if show_all is true
-            # Add available seats information
-            section["availableSeats"] = available_seats
-            debugprint(f"Including section {section.get('sectionName')} with {available_seats} seats")
-
-            # Add exam information - Prioritize data from sectionSchedule
-            section_schedule = section.get("sectionSchedule", {})
 
-            # Midterm Exam
-            section["midExamDate"] = section_schedule.get("midExamDate") or section.get(
-                "midExamDate"
-            )
-            section["midExamStartTime"] = section_schedule.get(
-                "midExamStartTime"
-            ) or section.get("midExamStartTime")
-            section["midExamEndTime"] = section_schedule.get(
-                "midExamEndTime"
-            ) or section.get("midExamEndTime")
-
-            # Final Exam
-            section["finalExamDate"] = section_schedule.get(
-                "finalExamDate"
-            ) or section.get("finalExamDate")
-            section["finalExamStartTime"] = section_schedule.get(
-                "finalExamStartTime"
-            ) or section.get("finalExamStartTime")
-            section["finalExamEndTime"] = section_schedule.get(
-                "finalExamEndTime"
-            ) or section.get("finalExamEndTime")
-
-            # Optional: Add formatted exam times (12-hour AM/PM) using the
-            # prioritized times
-            if section.get("midExamStartTime") and section.get("midExamEndTime"):
-                section["formattedMidExamTime"] = convert_time_24_to_12(
-                    f"{section['midExamStartTime']} - {section['midExamEndTime']}"
-                )
-            else:
-                section["formattedMidExamTime"] = None
+    # Display fields were computed when the snapshot was built; the
+    # serialized and compressed response is built once per course
+    return send_prepared(snapshot.course_details_payload(code, show_all))
 
-            if section.get("finalExamStartTime") and section.get("finalExamEndTime"):
-                section["formattedFinalExamTime"] = convert_time_24_to_12(
-                    f"{section['finalExamStartTime']} - {section['finalExamEndTime']}"
-                )
-            else:
-                section["formattedFinalExamTime"] = None
-
-            # Format schedule information
-            if section.get("sectionSchedule"):
-                class_schedules = section["sectionSchedule"].get("classSchedules")
-                if isinstance(class_schedules, list):
-                    for schedule in class_schedules:
-                        schedule["formattedTime"] = convert_time_24_to_12(
-                            f"{schedule['startTime']} - {schedule['endTime']}"
-                        )
-                else:
-                    # If classSchedules is not a list, skip formatting
-                    pass
-
-            # Format lab schedule information
-            lab_schedules = section.get("labSchedules")
-            if isinstance(lab_schedules, list):
-                for schedule in lab_schedules:
-                    schedule["formattedTime"] = convert_time_24_to_12(
-                        f"{schedule['startTime']} - {schedule['endTime']}"
-                    )
-            else:
-                # If labSchedules is not a list, skip formatting
-                pass
 
-            details.append(section)
+@app.route("/api/course_details_batch")
+def course_details_batch():
+    """Return course_details for several courses in one response, keyed by course code."""
+    snapshot = catalog.get()
+    if snapshot is None:
+        return jsonify({"error": "Failed to load course data. Please try again later."}), 503
+    course_codes = [code for code in request.args.get("courses", "").split(",") if code]
+    show_all = request.args.get("show_all", "false").lower() == "true"
 
-    debugprint(f"Returning {len(details)} sections")
-    return jsonify(details)
+    return send_prepared(snapshot.course_details_batch_payload(course_codes, show_all))
 
 
 @app.route("/api/faculty")
 def get_faculty():
     # Get unique faculty names from all sections
-    faculty = set()
-    for section in data:
-        if section.get("faculties"):
-            faculty.add(section.get("faculties"))
-    return jsonify(list(faculty))
+    snapshot = catalog.get()
+    if snapshot is None:
+        return jsonify({"error": "Failed to load course data. Please try again later."}), 503
+    return jsonify(list(snapshot.by_faculty))
 
 
 @app.route("/api/faculty_for_courses")
 def get_faculty_for_courses():
     course_codes = request.args.get("courses", "").split(",")
+    snapshot = catalog.get()
+    if snapshot is None:
+        return jsonify({"error": "Failed to load course data. Please try again later."}), 503
     faculty = set()
 
     # Get faculty for each course
     for code in course_codes:
-        sections = [section for section in data if section.get("courseCode") == code]
-        for section in sections:
-            if section.get("faculties"):
-                faculty.add(section.get("faculties"))
+        for section in snapshot.course_sections(code):
+            if section.faculty:
+                faculty.add(section.faculty)
 
     return jsonify(list(faculty))
 
 
 def get_lab_schedule(section):
     """Extract and format lab schedule information for a section, supporting both array and nested object formats."""
-    debugprint(f"\nGetting lab schedule for section {section.get('courseCode')} {section.get('sectionName')}")
+    trace("\nGetting lab schedule for section %s %s", section.get('courseCode'), section.get('sectionName'))
     lab_schedules = section.get("labSchedules", [])
     formatted_labs = []
 
@@ -777,7 +1103,7 @@ def get_lab_schedule(section):
                     "endMinutes": sched_end,
                 }
                 formatted_labs.append(lab_info)
-                debugprint(f"Added lab schedule: {day} {formatted_time} in {room}")
+                trace("Added lab schedule: %s %s in %s", day, formatted_time, room)
     # If lab_schedules is a list (legacy/expected format)
     elif isinstance(lab_schedules, list):
         debugprint("Processing lab schedules in legacy format (list)")
@@ -800,12 +1126,12 @@ def get_lab_schedule(section):
                     "endMinutes": sched_end,
                 }
                 formatted_labs.append(lab_info)
-                debugprint(f"Added lab schedule: {day} {formatted_time} in {room}")
+                trace("Added lab schedule: %s %s in %s", day, formatted_time, room)
     # Otherwise, return empty list
     else:
-        debugprint(f"Warning: Unrecognized lab schedule format: {type(lab_schedules)}")
+        trace("Warning: Unrecognized lab schedule format: %s", type(lab_schedules))
     
-    debugprint(f"Found {len(formatted_labs)} lab schedules")
+    trace("Found %s lab schedules", len(formatted_labs))
     return formatted_labs
 
 
@@ -825,8 +1151,8 @@ def get_lab_schedule_bd(section):
             try:
                 # Assume input is in HH:MM:SS, treat as naive local time,
                 # localize to UTC, then convert
-                start_dt = datetime.strptime(start, "%H:%M:%S")
-                end_dt = datetime.strptime(end, "%H:%M:%S")
+                start_dt = parse_clock(start, "%H:%M:%S")
+                end_dt = parse_clock(end, "%H:%M:%S")
                 # Attach today's date for conversion
                 today = datetime.now().date()
                 start_dt = datetime.combine(today, start_dt.time())
@@ -867,18 +1193,18 @@ def get_lab_schedule_bd(section):
 
 def check_lab_conflicts(section1, section2):
     """Check if two sections have conflicting lab schedules."""
-    debugprint(f"\nChecking lab conflicts between {section1.get('courseCode')} and {section2.get('courseCode')}")
+    trace("\nChecking lab conflicts between %s and %s", section1.get('courseCode'), section2.get('courseCode'))
     labs1 = get_lab_schedule(section1)
     labs2 = get_lab_schedule(section2)
 
-    debugprint(f"Found {len(labs1)} labs for {section1.get('courseCode')} and {len(labs2)} labs for {section2.get('courseCode')}")
+    trace("Found %s labs for %s and %s labs for %s", len(labs1), section1.get('courseCode'), len(labs2), section2.get('courseCode'))
 
     for lab1 in labs1:
         for lab2 in labs2:
             if lab1["day"] == lab2["day"]:
-                debugprint(f"Checking overlap for {lab1['day']}:")
-                debugprint(f"{section1.get('courseCode')}: {lab1['formattedTime']} in {lab1['room']}")
-                debugprint(f"{section2.get('courseCode')}: {lab2['formattedTime']} in {lab2['room']}")
+                trace("Checking overlap for %s:", lab1['day'])
+                trace("%s: %s in %s", section1.get('courseCode'), lab1['formattedTime'], lab1['room'])
+                trace("%s: %s in %s", section2.get('courseCode'), lab2['formattedTime'], lab2['room'])
                 if schedules_overlap(
                     lab1["startMinutes"],
                     lab1["endMinutes"],
@@ -989,304 +1315,818 @@ def get_required_days_for_course(sections):
     return required_days
 
 
-def check_exam_compatibility(sections):
-    """Check if a set of sections has any exam conflicts. Returns (has_conflicts, error_message)."""
-    exam_conflicts = []
-    
-    # Check all possible pairs of sections, including different sections of the same course
-    for i, section1 in enumerate(sections):
-        for j in range(i + 1, len(sections)):
-            section2 = sections[j]
-            conflicts = check_exam_conflicts(section1, section2)
-            if conflicts:
-                exam_conflicts.extend(conflicts)
-
-    if exam_conflicts:
-        error_message = format_exam_conflicts_message(exam_conflicts)
-        return True, error_message
-
-    return False, None
-
-
 def normalize_time(time_str):
     """Normalize time string to HH:MM:SS format."""
     if not time_str:
         debugprint("Warning: Empty time string")
         return "00:00:00"
+    parsed = parse_time_of_day(time_str)
+    if parsed is None:
+        trace("Could not normalize time %s", time_str)
+        return "00:00:00"  # Return midnight if parsing fails
+    result = "%02d:%02d:%02d" % parsed
+    trace("Normalized %s to %s", time_str, result)
+    return result
+
 
-    time_str = time_str.strip().upper()
-    debugprint(f"Normalizing time: {time_str}")
+def time_slot_ranges(time_slots):
+    """Parse "start-end" slot labels to (start, end) minutes, or None for a malformed slot."""
+    return [_time_slot_range(slot) for slot in time_slots]
 
+
+@lru_cache(maxsize=256)
+def _time_slot_range(time_slot):
     try:
-        # Handle AM/PM format
-        if "AM" in time_str or "PM" in time_str:
-            # Remove any seconds if present
-            time_str = re.sub(r":\d+\s*(AM|PM)", r" \1", time_str)
-            # Add missing colons if needed (e.g., "8 AM" -> "8:00 AM")
-            if ":" not in time_str:
-                time_str = time_str.replace(" ", ":00 ")
-            try:
-                dt = datetime.strptime(time_str, "%I:%M %p")
-                result = dt.strftime("%H:%M:%S")
-                debugprint(f"Normalized {time_str} to {result} (12-hour format)")
-                return result
-            except ValueError:
-                try:
-                    dt = datetime.strptime(time_str, "%I:%M:%S %p")
-                    result = dt.strftime("%H:%M:%S")
-                    debugprint(f"Normalized {time_str} to {result} (12-hour format with seconds)")
-                    return result
-                except ValueError:
-                    # Try one more time with flexible parsing
-                    time_str = re.sub(
-                        r"(\d{1,2})(?:\s*:\s*(\d{2}))?\s*(AM|PM)", r"\1:\2 \3", time_str
-                    )
-                    # Fix the string joining operation
-                    parts = time_str.replace(":", ":00:").split(":")
-                    time_str = ":".join(parts[0:2]) + " " + time_str.split()[-1]
-                    dt = datetime.strptime(time_str, "%I:%M %p")
-                    result = dt.strftime("%H:%M:%S")
-                    debugprint(f"Normalized {time_str} to {result} (12-hour format with flexible parsing)")
-                    return result
-        else:
-            # Handle 24-hour format
-            parts = time_str.split(":")
-            if len(parts) == 1:  # Just hours
-                result = f"{int(parts[0]):02d}:00:00"
-                debugprint(f"Normalized {time_str} to {result} (24-hour format, hours only)")
-                return result
-            elif len(parts) == 2:  # Hours and minutes
-                result = f"{int(parts[0]):02d}:{int(parts[1]):02d}:00"
-                debugprint(f"Normalized {time_str} to {result} (24-hour format, hours and minutes)")
-                return result
-            else:  # Full time
-                result = f"{int(parts[0]):02d}:{int(parts[1]):02d}:{int(parts[2]):02d}"
-                debugprint(f"Normalized {time_str} to {result} (24-hour format, full time)")
-                return result
-    except Exception as e:
-        debugprint(f"Error normalizing time {time_str}: {e}")
-        return "00:00:00"  # Return midnight if parsing fails
+        slot_start, slot_end = time_slot.split("-")
+    except (AttributeError, ValueError):
+        return None
+    # Slot labels have always been read to the hour ("9:30 AM" as 9:00, the
+    # old normalize_time dropped 12-hour minutes); kept so the preference
+    # filter accepts the same sections as before
+    start, end = parse_time_of_day(slot_start), parse_time_of_day(slot_end)
+    return (start[0] * 60 if start else 0), (end[0] * 60 if end else 0)
 
 
 def filter_section_by_time(section, selected_times):
     """Check if section schedules fit within selected time ranges."""
-    debugprint(f"\nFiltering section {section.get('courseCode')} {section.get('sectionName')} by time")
+    section = as_section(section)
+    trace("\nFiltering section %s %s by time", section.course_code, section.section_name)
     if not selected_times:  # If no times selected, accept all
         debugprint("No time restrictions, accepting section")
         return True, "No time restrictions"
 
-    def time_in_ranges(schedule_type, day, start_time, end_time):
-        try:
-            if not start_time or not end_time:
-                debugprint(f"Missing time data for {schedule_type}, accepting schedule")
-                return True, None  # Accept if missing time data
-
-            # Normalize times
-            start_time = normalize_time(start_time)
-            end_time = normalize_time(end_time)
-            debugprint(f"Checking {schedule_type} schedule: {day} {start_time}-{end_time}")
-
-            start_minutes = TimeUtils.time_to_minutes(start_time)
-            end_minutes = TimeUtils.time_to_minutes(end_time)
-
-            # For lab sessions, we need to ensure ALL required time slots are
-            # selected
-            if schedule_type == "Lab":
-                debugprint("Processing lab schedule")
-                # Validate lab duration (should be at least 2 hours and 50
-                # minutes)
-                lab_duration = end_minutes - start_minutes
-                if lab_duration < 170:  # 2 hours and 50 minutes = 170 minutes
-                    debugprint(f"Lab duration ({lab_duration} minutes) is less than required 2 hours and 50 minutes")
-                    return (
-                        False,
-                        f"Lab session duration ({lab_duration} minutes) is less than required 2 hours and 50 minutes",
-                    )
+    selected_ranges = None
+    for meeting in section.meetings:
+        if not meeting.timed:
+            continue  # Accept if missing time data
+
+        start_minutes = meeting.start
+        end_minutes = meeting.end
+
+        # For lab sessions, we need to ensure ALL required time slots are
+        # selected
+        if meeting.kind == "Lab":
+            # Validate lab duration (should be at least 2 hours and 50
+            # minutes)
+            lab_duration = end_minutes - start_minutes
+            if lab_duration < 170:  # 2 hours and 50 minutes = 170 minutes
+                trace("Lab duration (%s minutes) is less than required 2 hours and 50 minutes", lab_duration)
+                return (
+                    False,
+                    f"Lab session duration ({lab_duration} minutes) is less than required 2 hours and 50 minutes",
+                )
 
-                # Get all time slots that this lab session spans
-                required_slots = []
-                for time_slot in TIME_SLOTS:
-                    slot_start, slot_end = time_slot.split("-")
-                    slot_start = normalize_time(slot_start.strip())
-                    slot_end = normalize_time(slot_end.strip())
-                    range_start = TimeUtils.time_to_minutes(slot_start)
-                    range_end = TimeUtils.time_to_minutes(slot_end)
-
-                    # If this slot overlaps with the lab session, it's required
-                    if start_minutes <= range_end and end_minutes >= range_start:
-                        required_slots.append(time_slot)
-                        debugprint(f"Found required time slot: {time_slot}")
-
-                # Check if all required slots are selected
-                if not all(slot in selected_times for slot in required_slots):
-                    missing_slots = [slot for slot in required_slots if slot not in selected_times]
-                    debugprint(f"Missing required time slots: {', '.join(missing_slots)}")
-                    return (
-                        False,
-                        f"Lab session requires all time slots it spans to be selected: {', '.join(required_slots)}",
-                    )
-                debugprint("All required time slots are selected")
-                return True, None
-
-            # For regular classes, use the original overlap check
-            debugprint("Processing regular class schedule")
-            for time_slot in selected_times:
-                slot_start, slot_end = time_slot.split("-")
-                slot_start = normalize_time(slot_start.strip())
-                slot_end = normalize_time(slot_end.strip())
-                range_start = TimeUtils.time_to_minutes(slot_start)
-                range_end = TimeUtils.time_to_minutes(slot_end)
-
-                debugprint(f"Checking time slot {time_slot}")
-                if start_minutes <= range_end and end_minutes >= range_start:
-                    debugprint("Schedule fits in time slot")
-                    return True, None
-
-            debugprint(f"Schedule doesn't fit in any selected time slot")
+            # Get all time slots that this lab session spans
+            required_slots = [
+                time_slot
+                for time_slot, (range_start, range_end) in zip(TIME_SLOTS, time_slot_ranges(TIME_SLOTS))
+                if start_minutes <= range_end and end_minutes >= range_start
+            ]
+
+            # Check if all required slots are selected
+            if not all(slot in selected_times for slot in required_slots):
+                return (
+                    False,
+                    f"Lab session requires all time slots it spans to be selected: {', '.join(required_slots)}",
+                )
+            continue
+
+        # For regular classes, use the original overlap check
+        if selected_ranges is None:
+            selected_ranges = time_slot_ranges(selected_times)
+        fits = False
+        for slot_range in selected_ranges:
+            if slot_range is None:
+                # Unparseable slot: accept the schedule, as before
+                fits = True
+                break
+            range_start, range_end = slot_range
+            if start_minutes <= range_end and end_minutes >= range_start:
+                fits = True
+                break
+        if not fits:
+            trace("Schedule doesn't fit in any selected time slot")
             return (
                 False,
-                f"{schedule_type} time {start_time}-{end_time} doesn't fit in any selected time slot",
+                f"{meeting.kind} time {meeting.start_time}-{meeting.end_time} doesn't fit in any selected time slot",
             )
 
-        except Exception as e:
-            debugprint(f"Error in time_in_ranges: {e}")
-            return True, None  # Accept the section if there's an error in time parsing
+    debugprint("All schedules fit within selected times")
+    return True, None
 
-    # Check class schedules
-    debugprint("Checking class schedules")
-    if section.get("sectionSchedule") and section["sectionSchedule"].get(
-        "classSchedules"
-    ):
-        for schedule in section["sectionSchedule"]["classSchedules"]:
-            valid, error = time_in_ranges(
-                "Class",
-                schedule.get("day", ""),
-                schedule.get("startTime", ""),
-                schedule.get("endTime", ""),
-            )
-            if not valid:
-                debugprint(f"Class schedule invalid: {error}")
-                return False, error
-
-    # Check lab schedules
-    debugprint("Checking lab schedules")
-    for lab in get_lab_schedules_flat(section):
-        valid, error = time_in_ranges(
-            "Lab",
-            lab.get("day", ""),
-            lab.get("startTime", ""),
-            lab.get("endTime", ""),
+
+def filter_sections_by_preferences(sections, selected_times, selected_days):
+    """Split one course's sections by the day/time preferences into (kept, rejection reasons)."""
+    kept = []
+    reasons = []
+    for section in sections:
+        # Check if section schedules fit within selected times
+        valid_time, error = filter_section_by_time(section, selected_times)
+        if not valid_time:
+            trace("✗ Time conflict: %s", error)
+            reasons.append(f"Section {section.section_name}: {error}")
+            continue
+
+        # Check if section days are in selected days
+        extra_days = section.days - selected_days
+        if extra_days:
+            trace("✗ Day conflict: %s requires days not in selection", section.course_code)
+            reasons.append(f"Section {section.section_name}: meets on {', '.join(sorted(extra_days))}, which is not selected")
+            continue
+
+        kept.append(section)
+    return kept, reasons
+
+
+def format_preference_rejections(course_code, reasons, limit=3):
+    """Error message for a course none of whose sections fit the preferences."""
+    distinct = list(dict.fromkeys(reasons))
+    lines = [f"No sections of {course_code} fit your day and time preferences"]
+    lines.extend(f"• {reason}" for reason in distinct[:limit])
+    if len(distinct) > limit:
+        lines.append(f"• and {len(distinct) - limit} more")
+    return "\n".join(lines)
+
+
+# Weekday names as they appear in the catalog, in week order
+WEEKDAYS = ("SUNDAY", "MONDAY", "TUESDAY", "WEDNESDAY", "THURSDAY", "FRIDAY", "SATURDAY")
+DAY_INDEX = {day: index for index, day in enumerate(WEEKDAYS)}
+
+# Exams without an end time are assumed to last this long
+DEFAULT_EXAM_MINUTES = 120
+
+# Week occupancy masks: one bit per 5-minute slot, one 288-bit field per day
+WEEK_SLOT_MINUTES = 5
+SLOTS_PER_DAY = 24 * 60 // WEEK_SLOT_MINUTES
+
+
+class Meeting:
+    """One weekly class or lab meeting with its times parsed once."""
+
+    __slots__ = ("kind", "day", "day_index", "start", "end", "start_time", "end_time", "timed", "mask")
+
+    def __init__(self, kind, schedule):
+        start_time = schedule.get("startTime", "")
+        end_time = schedule.get("endTime", "")
+        self.kind = kind
+        self.day = (schedule.get("day") or "").upper()
+        self.day_index = DAY_INDEX.get(self.day, -1)
+        # Missing times are kept visible so preference checks can skip them
+        self.timed = bool(start_time and end_time)
+        self.start_time = normalize_time(start_time)
+        self.end_time = normalize_time(end_time)
+        self.start = TimeUtils.time_to_minutes(self.start_time)
+        self.end = TimeUtils.time_to_minutes(self.end_time)
+        self.mask = self._week_mask()
+
+    def _week_mask(self):
+        """Occupancy bits for this meeting, or None when a mask can't represent it exactly."""
+        if self.end <= self.start:
+            return 0  # empty interval, never overlaps
+        if (
+            self.day_index < 0
+            or self.start % WEEK_SLOT_MINUTES
+            or self.end % WEEK_SLOT_MINUTES
+            or self.end > 24 * 60
+        ):
+            return None
+        width = (self.end - self.start) // WEEK_SLOT_MINUTES
+        offset = self.day_index * SLOTS_PER_DAY + self.start // WEEK_SLOT_MINUTES
+        return ((1 << width) - 1) << offset
+
+    def overlaps(self, other):
+        # Same test as schedules_overlap, inlined for the solver's inner loops
+        return self.day == other.day and max(self.start, other.start) < min(self.end, other.end)
+
+
+class ExamSlot:
+    """A mid or final exam with its date normalized to YYYY-MM-DD and times in minutes."""
+
+    __slots__ = ("kind", "date", "raw_date", "start", "end", "start_time", "end_time")
+
+    def __init__(self, kind, raw_date, start_time, end_time):
+        self.kind = kind
+        self.raw_date = raw_date
+        self.date = normalize_date(raw_date)
+        self.start_time = start_time
+        self.end_time = end_time
+        self.start = TimeUtils.time_to_minutes(normalize_time(start_time)) if start_time else None
+        if end_time:
+            self.end = TimeUtils.time_to_minutes(normalize_time(end_time))
+        elif self.start is not None:
+            self.end = self.start + DEFAULT_EXAM_MINUTES
+        else:
+            self.end = None
+
+    def clashes_with(self, other):
+        """Same kind, same normalized date and overlapping time windows."""
+        return (
+            self.kind == other.kind
+            and self.date == other.date
+            and max(self.start, other.start) < min(self.end, other.end)
         )
-        if not valid:
-            debugprint(f"Lab schedule invalid: {error}")
-            return False, error
 
-    debugprint("All schedules fit within selected times")
-    return True, None
 
+class Section:
+    """Compiled, read-only view of one catalog section used by the solvers. `raw` is the catalog dict."""
+
+    __slots__ = (
+        "raw",
+        "course_code",
+        "section_name",
+        "section_id",
+        "faculty",
+        "available_seats",
+        "meetings",
+        "days",
+        "week_mask",
+        "loose_meetings",
+        "internal_conflict",
+        "course_index",
+        "mid_exam",
+        "final_exam",
+        "exams",
+        "schedule_key",
+    )
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.course_code = raw.get("courseCode")
+        self.section_name = raw.get("sectionName")
+        self.section_id = raw.get("sectionId")
+        self.faculty = raw.get("faculties")
+        self.available_seats = raw.get("capacity", 0) - raw.get("consumedSeat", 0)
+
+        meetings = []
+        schedule = raw.get("sectionSchedule") or {}
+        if isinstance(schedule, dict) and isinstance(schedule.get("classSchedules"), list):
+            meetings.extend(Meeting("Class", s) for s in schedule["classSchedules"] if isinstance(s, dict))
+        meetings.extend(Meeting("Lab", lab) for lab in get_lab_schedules_flat(raw))
+        self.meetings = tuple(meetings)
+        self.days = frozenset(m.day for m in self.meetings if m.day)
+        # Meetings that fit the grid are folded into one week mask; the rest stay loose
+        self.week_mask = 0
+        for meeting in self.meetings:
+            if meeting.mask is not None:
+                self.week_mask |= meeting.mask
+        self.loose_meetings = tuple(m for m in self.meetings if m.mask is None)
+        # Position within the snapshot's by_course tuple, -1 outside a snapshot
+        self.course_index = -1
+        self.internal_conflict = any(
+            a.overlaps(b) for i, a in enumerate(self.meetings) for b in self.meetings[i + 1 :]
+        )
 
-def check_schedule_compatibility(schedule1, schedule2):
-    """Check if two schedules are compatible (no time conflicts)."""
-    try:
-        debugprint("\n=== STEP 2: Checking Time Conflicts ===")
-        
-        # Safely get day values with .get()
-        day1 = schedule1.get("day", "").upper() if isinstance(schedule1, dict) else ""
-        day2 = schedule2.get("day", "").upper() if isinstance(schedule2, dict) else ""
-        
-        debugprint(f"Checking schedule compatibility:")
-        debugprint(f"Schedule 1: Day={day1}, Start={schedule1.get('startTime', '')}, End={schedule1.get('endTime', '')}")
-        debugprint(f"Schedule 2: Day={day2}, Start={schedule2.get('startTime', '')}, End={schedule2.get('endTime', '')}")
-        
-        if day1 != day2:
-            debugprint(f"Different days ({day1} vs {day2}), no conflict")
+        exam_source = schedule if isinstance(schedule, dict) else {}
+        self.mid_exam = self._exam(raw, exam_source, "Mid", "midExam")
+        self.final_exam = self._exam(raw, exam_source, "Final", "finalExam")
+        # Only exams with a parsable date and a start time can clash
+        self.exams = tuple(
+            exam for exam in (self.mid_exam, self.final_exam)
+            if exam is not None and exam.date and exam.start is not None
+        )
+        # Sections with equal keys are interchangeable for every solver check
+        # (conflicts, exams, preferences, score); they differ only in faculty,
+        # room, seats and the like
+        self.schedule_key = (
+            tuple(sorted(
+                (m.kind, m.day, m.start, m.end, m.timed, m.start_time, m.end_time) for m in self.meetings
+            )),
+            tuple((e.kind, e.date, e.start, e.end) for e in self.exams),
+        )
+
+    @staticmethod
+    def _exam(raw, schedule, kind, prefix):
+        # Same priority as course_details: sectionSchedule first, then the section itself
+        date = schedule.get(f"{prefix}Date") or raw.get(f"{prefix}Date")
+        if not date:
+            return None
+        start = schedule.get(f"{prefix}StartTime") or raw.get(f"{prefix}StartTime")
+        end = schedule.get(f"{prefix}EndTime") or raw.get(f"{prefix}EndTime")
+        return ExamSlot(kind, date, start, end)
+
+    def conflicts_with(self, other):
+        """Check whether any meeting of this section overlaps one of `other`."""
+        if self.week_mask & other.week_mask:
             return True
+        # Pairs with at least one off-grid meeting need the interval test
+        for a in self.loose_meetings:
+            for b in other.meetings:
+                if a.overlaps(b):
+                    return True
+        for b in other.loose_meetings:
+            for a in self.meetings:
+                if a.overlaps(b):
+                    return True
+        return False
 
-        # Safely get time values with .get()
-        start1 = TimeUtils.time_to_minutes(normalize_time(schedule1.get("startTime", "")))
-        end1 = TimeUtils.time_to_minutes(normalize_time(schedule1.get("endTime", "")))
-        start2 = TimeUtils.time_to_minutes(normalize_time(schedule2.get("startTime", "")))
-        end2 = TimeUtils.time_to_minutes(normalize_time(schedule2.get("endTime", "")))
+    def exam_clashes(self, other):
+        """Return (own exam, other exam) pairs that clash."""
+        return [(mine, theirs) for mine in self.exams for theirs in other.exams if mine.clashes_with(theirs)]
 
-        compatible = not schedules_overlap(start1, end1, start2, end2)
-        debugprint(f"Schedules are {'compatible' if compatible else 'not compatible'}")
-        return compatible
-    except Exception as e:
-        debugprint(f"Error in check_schedule_compatibility: {e}")
-        return False  # If there's any error, assume there's a conflict to be safe
+    def may_conflict_with(self, other):
+        """Cheap pre-check: False means the two sections certainly don't overlap."""
+        return bool(self.week_mask & other.week_mask) or bool(self.loose_meetings or other.loose_meetings)
 
 
-def get_all_schedules(section):
-    """Get all schedules (both class and lab) for a section."""
-    debugprint(f"\nGetting all schedules for section {section.get('courseCode')} {section.get('sectionName')}")
-    schedules = []
-    # Add class schedules
-    if section.get("sectionSchedule") and section["sectionSchedule"].get(
-        "classSchedules"
-    ):
-        class_schedules = section["sectionSchedule"]["classSchedules"]
-        schedules.extend(class_schedules)
-        debugprint(f"Added {len(class_schedules)} class schedules")
-        for sched in class_schedules:
-            debugprint(f"Class schedule: {sched.get('day')} {sched.get('startTime')}-{sched.get('endTime')}")
-    
-    # Add lab schedules using the flat helper function
-    lab_schedules = get_lab_schedules_flat(section)
-    schedules.extend(lab_schedules)
-    debugprint(f"Added {len(lab_schedules)} lab schedules")
-    for lab in lab_schedules:
-        debugprint(f"Lab schedule: {lab.get('day')} {lab.get('startTime')}-{lab.get('endTime')}")
-    
-    debugprint(f"Total schedules: {len(schedules)}")
-    return schedules
+def compile_section(section):
+    """Build the compiled Section for a raw catalog dict."""
+    return Section(section)
+
+
+def as_section(section):
+    """Accept either a compiled Section or a raw catalog dict and return a Section."""
+    if isinstance(section, Section):
+        return section
+    return compile_section(section)
+
+
+class SearchStats:
+    """Counters for one routine search, reported as a single line when the request ends."""
+
+    __slots__ = ("label", "tried", "accepted", "pruned", "started", "stopped")
+
+    def __init__(self, label):
+        self.label = label
+        self.tried = 0
+        self.accepted = 0
+        self.pruned = {}
+        self.started = time.monotonic()
+        # Set when a SearchBudget ran out before the search finished
+        self.stopped = False
+
+    def prune(self, reason, count=1):
+        self.pruned[reason] = self.pruned.get(reason, 0) + count
+
+    def as_dict(self):
+        return {
+            "tried": self.tried,
+            "pruned": dict(self.pruned),
+            "accepted": self.accepted,
+            "elapsedMs": round((time.monotonic() - self.started) * 1000, 1),
+        }
+
+    def report(self):
+        stats = self.as_dict()
+        pruned = ", ".join(f"{reason}={count}" for reason, count in sorted(stats["pruned"].items()))
+        print(
+            f"[{self.label}] tried={stats['tried']} pruned={sum(self.pruned.values())}"
+            f"{f' ({pruned})' if pruned else ''} accepted={stats['accepted']} in {stats['elapsedMs']}ms"
+            f"{' (budget exhausted)' if self.stopped else ''}"
+        )
+
+
+# Default limits for one routine search; requests may only lower them
+ROUTINE_TIME_BUDGET_SECONDS = float(os.environ.get("ROUTINE_TIME_BUDGET_SECONDS", "10"))
+ROUTINE_NODE_BUDGET = int(os.environ.get("ROUTINE_NODE_BUDGET", "500000"))
+# Separate limits for the searches that only pick the error message of an
+# infeasible request
+DIAGNOSIS_TIME_BUDGET_SECONDS = float(os.environ.get("DIAGNOSIS_TIME_BUDGET_SECONDS", "1"))
+DIAGNOSIS_NODE_BUDGET = int(os.environ.get("DIAGNOSIS_NODE_BUDGET", "50000"))
+
+
+class SearchBudget:
+    """Wall-clock and node limits shared by the searches of one request."""
+
+    __slots__ = ("deadline", "nodes_left", "exhausted", "stats")
+
+    def __init__(self, seconds=ROUTINE_TIME_BUDGET_SECONDS, max_nodes=ROUTINE_NODE_BUDGET, stats=None):
+        self.deadline = time.monotonic() + seconds
+        self.nodes_left = max_nodes
+        self.exhausted = False
+        self.stats = stats
+
+    @classmethod
+    def from_request(cls, request_data, stats=None):
+        """Budget from the server defaults, lowered by "timeBudgetMs"/"nodeBudget" if given."""
+        seconds = ROUTINE_TIME_BUDGET_SECONDS
+        max_nodes = ROUTINE_NODE_BUDGET
+        time_ms = request_data.get("timeBudgetMs")
+        if time_ms is not None:
+            if isinstance(time_ms, bool) or not isinstance(time_ms, (int, float)) or time_ms <= 0:
+                raise ValueError("timeBudgetMs must be a positive number")
+            seconds = min(seconds, time_ms / 1000)
+        nodes = request_data.get("nodeBudget")
+        if nodes is not None:
+            if isinstance(nodes, bool) or not isinstance(nodes, int) or nodes <= 0:
+                raise ValueError("nodeBudget must be a positive integer")
+            max_nodes = min(max_nodes, nodes)
+        return cls(seconds, max_nodes, stats)
+
+    def spend(self):
+        if self.exhausted:
+            return False
+        self.nodes_left -= 1
+        if self.nodes_left < 0 or time.monotonic() >= self.deadline:
+            self.exhausted = True
+            if self.stats is not None:
+                self.stats.stopped = True
+            return False
+        return True
+
+
+def time_compatible(section1, section2):
+    """Pairwise time rule of is_valid_combination (same course and faculty never clash)."""
+    if section1.course_code == section2.course_code and section1.faculty == section2.faculty:
+        return True
+    return not section1.conflicts_with(section2)
+
+
+class ExamIndex:
+    """Timed exams of a snapshot bucketed by (course code, exam kind, normalized date)."""
+
+    def __init__(self, by_course):
+        buckets = {}
+        for code, sections in by_course.items():
+            for section in sections:
+                for exam in section.exams:
+                    buckets.setdefault((code, exam.kind, exam.date), []).append((section, exam))
+        self._buckets = {key: tuple(entries) for key, entries in buckets.items()}
+
+    def clash_bits(self, section, course_code):
+        """Bitset (by course_index) of `course_code`'s sections whose exams clash with `section`."""
+        bits = 0
+        for mine in section.exams:
+            for other, theirs in self._buckets.get((course_code, mine.kind, mine.date), ()):
+                # Same sectionId is never a clash, like check_exam_conflicts
+                if other.section_id != section.section_id and mine.clashes_with(theirs):
+                    bits |= 1 << other.course_index
+        return bits
+
+
+class CompatibilityMatrix:
+    """Pairwise time and exam compatibility of sections as per-course-pair bitsets, LRU cached."""
+
+    TIME = 1
+    EXAM = 2
+
+    def __init__(self, by_course, exams, max_pairs):
+        self._by_course = by_course
+        self._exams = exams
+        self._max_pairs = max_pairs
+        self._blocks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def block(self, course_a, course_b):
+        """Return (time_rows, exam_rows) for course_a against course_b."""
+        key = (course_a, course_b)
+        with self._lock:
+            block = self._blocks.get(key)
+            if block is not None:
+                self._blocks.move_to_end(key)
+                return block
+        # Built outside the lock; a concurrent duplicate build gives the same rows
+        block, transposed = self._build(course_a, course_b)
+        with self._lock:
+            self._blocks[key] = block
+            self._blocks[(course_b, course_a)] = transposed
+            while len(self._blocks) > self._max_pairs:
+                self._blocks.popitem(last=False)
+        return block
+
+    def _build(self, course_a, course_b):
+        sections_a = self._by_course.get(course_a, ())
+        sections_b = self._by_course.get(course_b, ())
+        all_b = (1 << len(sections_b)) - 1
+        time_rows = [0] * len(sections_a)
+        exam_rows = [all_b & ~self._exams.clash_bits(section, course_b) for section in sections_a]
+        time_cols = [0] * len(sections_b)
+        exam_cols = [0] * len(sections_b)
+        for i, section_a in enumerate(sections_a):
+            exam_row = exam_rows[i]
+            for j, section_b in enumerate(sections_b):
+                if time_compatible(section_a, section_b):
+                    time_rows[i] |= 1 << j
+                    time_cols[j] |= 1 << i
+                if exam_row >> j & 1:
+                    exam_cols[j] |= 1 << i
+        return (tuple(time_rows), tuple(exam_rows)), (tuple(time_cols), tuple(exam_cols))
 
 
 def is_valid_combination(sections):
     """Check if a combination of sections has any schedule conflicts."""
     debugprint("\nChecking if section combination is valid")
+    sections = [as_section(section) for section in sections]
     for i, section1 in enumerate(sections):
-        debugprint(f"\nProcessing section {section1.get('courseCode')} {section1.get('sectionName')}")
-        schedules1 = get_all_schedules(section1)
-
         # Check for internal conflicts in the same section
-        debugprint("Checking for internal conflicts")
-        for j, sched1 in enumerate(schedules1):
-            for sched2 in schedules1[j + 1 :]:
-                if not check_schedule_compatibility(sched1, sched2):
-                    debugprint(f"Found internal conflict in {section1.get('courseCode')} section {section1.get('sectionName')}")
-                    return False
+        if section1.internal_conflict:
+            trace("Found internal conflict in %s section %s", section1.course_code, section1.section_name)
+            return False
 
         # Check conflicts with other sections
-        debugprint("Checking conflicts with other sections")
         for section2 in sections[i + 1 :]:
-            debugprint(f"Comparing with section {section2.get('courseCode')} {section2.get('sectionName')}")
             # Skip schedule compatibility check if sections are from the same
             # course and faculty
-            if section1.get("courseCode") == section2.get(
-                "courseCode"
-            ) and section1.get("faculties") == section2.get("faculties"):
-                debugprint(f"Skipping schedule compatibility check between sections of the same course and faculty: {section1.get('courseCode')} ({section1.get('faculties')})")
+            if section1.course_code == section2.course_code and section1.faculty == section2.faculty:
                 continue
 
-            schedules2 = get_all_schedules(section2)
-            for sched1 in schedules1:
-                for sched2 in schedules2:
-                    if not check_schedule_compatibility(sched1, sched2):
-                        debugprint(f"Found conflict between {section1.get('courseCode')} Section {section1.get('sectionName')} ({section1.get('faculties')}) and {section2.get('courseCode')} Section {section2.get('sectionName')} ({section2.get('faculties')})")
-                        return False
+            if section1.conflicts_with(section2):
+                trace("Found conflict between %s Section %s (%s) and %s Section %s (%s)", section1.course_code, section1.section_name, section1.faculty, section2.course_code, section2.section_name, section2.faculty)
+                return False
     debugprint("No conflicts found, combination is valid")
     return True
 
 
+def _popcount(bits):
+    return bin(bits).count("1")
+
+
+def collapse_equivalent_sections(domain):
+    """Keep the first section of each schedule_key, in domain order."""
+    seen = set()
+    representatives = []
+    for section in domain:
+        if section.schedule_key not in seen:
+            seen.add(section.schedule_key)
+            representatives.append(section)
+    return representatives
+
+
+def search_domains(domains, kinds):
+    """Candidate lists the solvers actually search: with TIME, self-conflicting sections go."""
+    if kinds & CompatibilityMatrix.TIME:
+        return [[section for section in domain if not section.internal_conflict] for domain in domains]
+    return [list(domain) for domain in domains]
+
+
+def compat_rows(domains, compat, kinds, lower=True):
+    """rows[d][k][i]: bitset of course k's sections compatible with section i of course d (d < k unless `lower`)."""
+    size = len(domains)
+    codes = [domain[0].course_code for domain in domains]
+    rows = [[None] * size for _ in range(size)]
+    for d in range(size):
+        for k in range(size):
+            if k == d or (k < d and not lower):
+                continue
+            time_rows, exam_rows = compat.block(codes[d], codes[k])
+            if kinds == CompatibilityMatrix.TIME:
+                rows[d][k] = time_rows
+            elif kinds == CompatibilityMatrix.EXAM:
+                rows[d][k] = exam_rows
+            else:
+                rows[d][k] = tuple(t & e for t, e in zip(time_rows, exam_rows))
+    return rows
+
+
+def iter_combinations(
+    domains, compat, kinds, stats=None, most_constrained=False, value_key=None, prune=None, budget=None
+):
+    """Yield the section combinations of `domains` that satisfy `kinds`, by backtracking with forward checking.
+
+    Combinations come out in request course order; `prune` and `budget` can cut the search short.
+    """
+    domains = search_domains(domains, kinds)
+    size = len(domains)
+    if size == 0 or not all(domains):
+        return
+
+    rows = compat_rows(domains, compat, kinds, lower=most_constrained)
+
+    alive = [0] * size
+    for d, domain in enumerate(domains):
+        for section in domain:
+            alive[d] |= 1 << section.course_index
+
+    degree = [0] * size
+    if most_constrained:
+        # How many candidates rule out part of another course: a static tie-breaker
+        for d, domain in enumerate(domains):
+            for k in range(size):
+                if k != d:
+                    degree[d] += sum(1 for s in domain if alive[k] & ~rows[d][k][s.course_index])
+
+    chosen = [None] * size
+    placed = []
+
+    def extend(alive):
+        if len(placed) == size:
+            yield tuple(chosen)
+            return
+        open_courses = [k for k in range(size) if chosen[k] is None]
+        if most_constrained:
+            depth = min(open_courses, key=lambda k: (_popcount(alive[k]), -degree[k], k))
+        else:
+            depth = open_courses[0]
+        bits = alive[depth]
+        candidates = [section for section in domains[depth] if bits >> section.course_index & 1]
+        if value_key is not None:
+            candidates.sort(key=value_key(placed))
+        for section in candidates:
+            index = section.course_index
+            if budget is not None and not budget.spend():
+                return
+            if stats is not None:
+                stats.tried += 1
+            narrowed = list(alive)
+            for k in open_courses:
+                if k == depth:
+                    continue
+                remaining = alive[k] & rows[depth][k][index]
+                if not remaining:
+                    if stats is not None:
+                        stats.prune("wipeout")
+                    break
+                narrowed[k] = remaining
+            else:
+                chosen[depth] = section
+                if prune is not None and prune(chosen, narrowed):
+                    chosen[depth] = None
+                    if stats is not None:
+                        stats.prune("bound")
+                    continue
+                placed.append(section)
+                yield from extend(narrowed)
+                placed.pop()
+                chosen[depth] = None
+
+    yield from extend(alive)
+
+
+def iter_product_combinations(domains, compat, kinds, stats=None, budget=None):
+    """The "exhaustive" engine: walk itertools.product lazily and look every pair up."""
+    domains = search_domains(domains, kinds)
+    size = len(domains)
+    if size == 0 or not all(domains):
+        return
+    rows = compat_rows(domains, compat, kinds, lower=False)
+    for combination in itertools.product(*domains):
+        if budget is not None and not budget.spend():
+            return
+        if stats is not None:
+            stats.tried += 1
+        if all(
+            rows[d][k][combination[d].course_index] >> combination[k].course_index & 1
+            for d in range(size)
+            for k in range(d + 1, size)
+        ):
+            yield combination
+
+
+def arc_consistency(domains, compat, kinds):
+    """AC-3 over the compatibility matrix: (reduced domains, None), or (None, positions) when a course runs out."""
+    domains = search_domains(domains, kinds)
+    size = len(domains)
+    for position, domain in enumerate(domains):
+        if not domain:
+            return None, [position]
+    rows = compat_rows(domains, compat, kinds)
+    alive = [0] * size
+    for position, domain in enumerate(domains):
+        for section in domain:
+            alive[position] |= 1 << section.course_index
+    # blame[d]: courses whose revisions removed sections from course d
+    blame = [set() for _ in range(size)]
+
+    queue = deque((d, k) for d in range(size) for k in range(size) if d != k)
+    queued = set(queue)
+    while queue:
+        d, k = queue.popleft()
+        queued.discard((d, k))
+        supported = 0
+        for section in domains[d]:
+            index = section.course_index
+            if alive[d] >> index & 1 and rows[d][k][index] & alive[k]:
+                supported |= 1 << index
+        if supported == alive[d]:
+            continue
+        alive[d] = supported
+        blame[d] |= {k} | blame[k]
+        if not supported:
+            return None, sorted({d} | blame[d])
+        for j in range(size):
+            if j != d and j != k and (j, d) not in queued:
+                queue.append((j, d))
+                queued.add((j, d))
+
+    reduced = [
+        [section for section in domain if alive[position] >> section.course_index & 1]
+        for position, domain in enumerate(domains)
+    ]
+    return reduced, None
+
+
+def explain_incompatible_courses(course_codes, preferred_only=False):
+    """Sentence for a set of courses arc_consistency found can't all fit together."""
+    course_codes = list(dict.fromkeys(course_codes))
+    within = " within your day and time preferences" if preferred_only else ""
+    if len(course_codes) == 1:
+        return f"No section of {course_codes[0]} fits with the other selected courses{within}."
+    if len(course_codes) == 2:
+        return (
+            f"{course_codes[0]} and {course_codes[1]} can't be taken together{within}: "
+            "every pair of their sections clashes."
+        )
+    listed = ", ".join(course_codes[:-1]) + f" and {course_codes[-1]}"
+    return f"{listed} can't all be taken together{within}: every choice of their sections has a clash."
+
+
+def local_search_routines(
+    domains, compat, count, selected_days, selected_times, commute_preference, stats=None, budget=None
+):
+    """The "local_search" engine: hill-climb on calculate_routine_score from the first routine found."""
+    both = CompatibilityMatrix.TIME | CompatibilityMatrix.EXAM
+    start = next(
+        iter_combinations(
+            domains,
+            compat,
+            both,
+            stats,
+            most_constrained=True,
+            value_key=routine_value_key(commute_preference),
+            budget=budget,
+        ),
+        None,
+    )
+    if start is None:
+        return []
+
+    domains = search_domains(domains, both)
+    size = len(domains)
+    rows = compat_rows(domains, compat, both)
+
+    def score_of(combination):
+        return calculate_routine_score(combination, selected_days, selected_times, commute_preference)
+
+    current = list(start)
+    current_score = score_of(start)
+    seen = {tuple(s.section_id for s in start): (current_score, start)}
+    improved = True
+    while improved:
+        improved = False
+        for position in range(size):
+            for candidate in domains[position]:
+                if candidate is current[position]:
+                    continue
+                index = candidate.course_index
+                if not all(
+                    rows[position][k][index] >> current[k].course_index & 1
+                    for k in range(size)
+                    if k != position
+                ):
+                    continue
+                if budget is not None and not budget.spend():
+                    break
+                if stats is not None:
+                    stats.tried += 1
+                trial = tuple(current[:position] + [candidate] + current[position + 1 :])
+                trial_score = score_of(trial)
+                seen.setdefault(tuple(s.section_id for s in trial), (trial_score, trial))
+                if trial_score > current_score:
+                    current, current_score = list(trial), trial_score
+                    improved = True
+            if budget is not None and budget.exhausted:
+                improved = False
+                break
+    ranked = sorted(seen.values(), key=lambda entry: entry[0], reverse=True)
+    return ranked[:count]
+
+
+# Engine choice for /api/routine: enumerate small searches outright and switch
+# ranking requests to local search when the estimated number of routines is huge
+EXHAUSTIVE_SEARCH_LIMIT = int(os.environ.get("EXHAUSTIVE_SEARCH_LIMIT", "2000"))
+LOCAL_SEARCH_THRESHOLD = float(os.environ.get("LOCAL_SEARCH_THRESHOLD", "1e6"))
+
+
+def estimate_search(domains, compat, kinds):
+    """Estimate (combinations, expected routines) for a routine search before running it."""
+    domains = search_domains(domains, kinds)
+    combinations = 1
+    for domain in domains:
+        combinations *= len(domain)
+    if combinations == 0:
+        return 0, 0.0
+    rows = compat_rows(domains, compat, kinds, lower=False)
+    routines = float(combinations)
+    for d in range(len(domains)):
+        for k in range(d + 1, len(domains)):
+            candidates = 0
+            for section in domains[k]:
+                candidates |= 1 << section.course_index
+            compatible = sum(_popcount(rows[d][k][s.course_index] & candidates) for s in domains[d])
+            routines *= compatible / (len(domains[d]) * len(domains[k]))
+    return combinations, routines
+
+
+def choose_search_engine(combinations, routines, mode):
+    """Pick "exhaustive", "backtracking" or "local_search" from an estimate_search result."""
+    if mode == "first":
+        return "backtracking"
+    if combinations <= EXHAUSTIVE_SEARCH_LIMIT:
+        return "exhaustive"
+    if mode == "rank" and routines > LOCAL_SEARCH_THRESHOLD:
+        return "local_search"
+    return "backtracking"
+
+
 def try_all_section_combinations(course_sections_map, selected_days, selected_times):
     """Try all possible combinations of sections to find a valid routine."""
+    stats = SearchStats("try_all_section_combinations")
     try:
         debugprint("\n=== Trying Section Combinations ===")
         
         # Get all possible combinations
         courses = list(course_sections_map.keys())
         all_combinations = list(itertools.product(*[course_sections_map[course] for course in courses]))
-        print(f"Generated {len(all_combinations)} possible combinations")
+        trace("Generated %s possible combinations", len(all_combinations))
         
         # Convert selected times to minutes for easier comparison
         time_ranges = []
@@ -1296,16 +2136,17 @@ def try_all_section_combinations(course_sections_map, selected_days, selected_ti
             end_mins = TimeUtils.time_to_minutes(end.strip())
             time_ranges.append((start_mins, end_mins))
             
-        print(f"\nSelected time ranges:")
-        for start, end in time_ranges:
-            print(f"• {TimeUtils.minutes_to_time(start)} - {TimeUtils.minutes_to_time(end)}")
+        if tracing():
+            debugprint("\nSelected time ranges:")
+            for start, end in time_ranges:
+                debugprint(f"• {TimeUtils.minutes_to_time(start)} - {TimeUtils.minutes_to_time(end)}")
             
         # Iterate through combinations
-        print("\nChecking combinations for conflicts...")
         valid_combinations = []
         
         for idx, combination in enumerate(all_combinations, 1):
-            print(f"\nTrying combination {idx}/{len(all_combinations)}")
+            stats.tried += 1
+            trace("Trying combination %s/%s", idx, len(all_combinations))
             
             # Check if all sections are within selected days and times
             valid = True
@@ -1333,23 +2174,22 @@ def try_all_section_combinations(course_sections_map, selected_days, selected_ti
                     break
             
             if not valid:
-                print("\nConflicts found:")
-                for conflict in conflicts:
-                    print(f"• {conflict}")
+                stats.prune("time")
+                trace("Conflicts found: %s", conflicts)
                 continue
             
             # Check if sections fit within selected days and times
             for section in combination:
                 course_code = section.get("courseCode")
                 section_name = section.get("sectionName")
-                print(f"\nChecking {course_code} Section {section_name}")
+                trace("Checking %s Section %s", course_code, section_name)
                 
                 # Check class schedules
                 if section.get("sectionSchedule"):
                     for schedule in section["sectionSchedule"].get("classSchedules", []):
                         day = schedule.get("day", "").upper()
                         if day not in selected_days:
-                            print(f"❌ Class day {day} not in selected days")
+                            trace("❌ Class day %s not in selected days", day)
                             valid = False
                             conflicts.append(f"{course_code} requires {day}")
                             break
@@ -1365,7 +2205,7 @@ def try_all_section_combinations(course_sections_map, selected_days, selected_ti
                                 break
                                 
                         if not time_valid:
-                            print(f"❌ Class time {schedule.get('startTime')} - {schedule.get('endTime')} outside selected times")
+                            trace("❌ Class time %s - %s outside selected times", schedule.get("startTime"), schedule.get("endTime"))
                             valid = False
                             conflicts.append(f"{course_code} time conflict")
                             break
@@ -1375,7 +2215,7 @@ def try_all_section_combinations(course_sections_map, selected_days, selected_ti
                 for lab in lab_schedules:
                     day = lab.get("day", "").upper()
                     if day not in selected_days:
-                        print(f"❌ Lab day {day} not in selected days")
+                        trace("❌ Lab day %s not in selected days", day)
                         valid = False
                         conflicts.append(f"{course_code} Lab requires {day}")
                         break
@@ -1391,7 +2231,7 @@ def try_all_section_combinations(course_sections_map, selected_days, selected_ti
                             break
                             
                     if not time_valid:
-                        print(f"❌ Lab time {lab.get('startTime')} - {lab.get('endTime')} outside selected times")
+                        trace("❌ Lab time %s - %s outside selected times", lab.get("startTime"), lab.get("endTime"))
                         valid = False
                         conflicts.append(f"{course_code} Lab time conflict")
                         break
@@ -1400,34 +2240,41 @@ def try_all_section_combinations(course_sections_map, selected_days, selected_ti
                     break
             
             if valid:
-                print("\n✅ Found valid combination!")
+                stats.accepted += 1
+                trace("✅ Found valid combination!")
                 valid_combinations.append(list(combination))
-                
-            if not valid:
-                print("\nConflicts in combination {idx}:")
-                for conflict in conflicts:
-                    print(f"• {conflict}")
+            else:
+                stats.prune("preferences")
+                trace("Conflicts in combination %s: %s", idx, conflicts)
         
         if valid_combinations:
             # Return the first valid combination
             return valid_combinations[0], None
                 
-        print("\n❌ No valid combination found")
+        debugprint("\n❌ No valid combination found")
         return None, "Could not find a valid combination without conflicts. Please try different sections or time slots."
         
     except Exception as e:
         print(f"\n❌ Error finding combinations: {e}")
         traceback.print_exc()
         return None, f"Error finding valid combinations: {e}"
+    finally:
+        stats.report()
+
+
+# Ranking mode of /api/routine: default and maximum number of routines returned
+ROUTINE_TOP_K_DEFAULT = 5
+ROUTINE_TOP_K_MAX = 20
 
 
 @app.route("/api/routine", methods=["POST"])
 def generate_routine():
+    stats = None
     try:
-        # Load fresh data for each routine generation request
-        debugprint("\n=== Loading Fresh Course Data ===")
-        fresh_data = load_data()  # Get fresh data from the API
-        if not fresh_data:
+        # Use the current catalog snapshot and its compiled sections
+        debugprint("\n=== Loading Course Data Snapshot ===")
+        snapshot = catalog.get()
+        if not snapshot or not snapshot.sections:
             return jsonify({"error": "Failed to load current course data"}), 503
         
         # Get request data
@@ -1445,9 +2292,20 @@ def generate_routine():
             times = request_data.get("times", [])
             use_ai = request_data.get("useAI", False)
             commute_preference = request_data.get("commutePreference", "")
+            # Optional ranking mode: return the topK best routines by calculate_routine_score
+            optimize = bool(request_data.get("optimize")) or "topK" in request_data
+            top_k = request_data.get("topK", ROUTINE_TOP_K_DEFAULT)
+            if optimize and (isinstance(top_k, bool) or not isinstance(top_k, int) or top_k < 1):
+                return jsonify({"error": "topK must be a positive integer"}), 400
+            top_k = min(top_k, ROUTINE_TOP_K_MAX)
+            stats = SearchStats("routine")
+            try:
+                budget = SearchBudget.from_request(request_data, stats)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
             
-            # Get all possible combinations
-            all_combinations = []
+            # Candidate sections per course, in request order
+            domains = []
             for course in courses:
                 course_code = course["course"]
                 sections_by_faculty = course.get("sections", {})
@@ -1458,21 +2316,13 @@ def generate_routine():
                 course_sections = []
                 
                 # Get all sections for the course
-                available_sections = [s for s in fresh_data if s.get("courseCode") == course_code]
+                available_sections = list(snapshot.course_sections(course_code))
                 debugprint(f"Total sections found for {course_code}: {len(available_sections)}")
                 
                 if not available_sections:
                     debugprint(f"❌ Course not found in fresh data: {course_code}")
                     return jsonify({"error": f"Course {course_code} not found in available courses"}), 400
 
-                # Print all sections and their details
-                for section in available_sections:
-                    debugprint(f"\nSection: {section.get('sectionName')}")
-                    debugprint(f"Faculty: {section.get('faculties')}")
-                    debugprint(f"Capacity: {section.get('capacity')}")
-                    debugprint(f"Consumed Seats: {section.get('consumedSeat')}")
-                    debugprint(f"Available Seats: {section.get('capacity', 0) - section.get('consumedSeat', 0)}")
-
                 # Check if specific sections are selected
                 if sections_by_faculty:
                     debugprint(f"\n=== Processing Faculty Selections for {course_code} ===")
@@ -1487,20 +2337,18 @@ def generate_routine():
                             debugprint(f"No specific section selected for faculty {faculty}")
                             faculty_sections = [
                                 s for s in available_sections 
-                                if s.get("faculties") == faculty 
-                                and s.get("capacity", 0) - s.get("consumedSeat", 0) > 0
+                                if s.faculty == faculty 
+                                and s.available_seats > 0
                             ]
-                            debugprint(f"Found {len(faculty_sections)} available sections for faculty {faculty}:")
-                            for s in faculty_sections:
-                                debugprint(f"- Section {s.get('sectionName')}: {s.get('capacity', 0) - s.get('consumedSeat', 0)} seats available")
+                            debugprint(f"Found {len(faculty_sections)} available sections for faculty {faculty}")
                             course_sections.extend(faculty_sections)
                             continue
                             
                         # Find matching section if specific section selected
                         matching_sections = [
                             s for s in available_sections 
-                            if s.get("sectionName") == section_name 
-                            and s.get("faculties") == faculty
+                            if s.section_name == section_name 
+                            and s.faculty == faculty
                         ]
                         
                         if matching_sections:
@@ -1512,7 +2360,7 @@ def generate_routine():
                     debugprint(f"No sections selected for {course_code}, getting all available sections")
                     course_sections = [
                         section for section in available_sections 
-                        if section.get("capacity", 0) - section.get("consumedSeat", 0) > 0
+                        if section.available_seats > 0
                     ]
                 
                 if not course_sections:
@@ -1524,125 +2372,239 @@ def generate_routine():
                     return jsonify({"error": msg}), 400
                 
                 debugprint(f"\nFinal sections selected for {course_code}: {len(course_sections)}")
-                for section in course_sections:
-                    debugprint(f"- Section {section.get('sectionName')} with faculty {section.get('faculties')}")
-                all_combinations.append(course_sections)
+                domains.append(course_sections)
 
-            if not all_combinations:
+            if not domains:
                 return jsonify({"error": "No valid sections found for any courses"}), 400
 
-            # Generate all possible combinations
-            try:
-                all_combinations = list(itertools.product(*all_combinations))
-                debugprint(f"Generated {len(all_combinations)} possible combinations")
-            except Exception as e:
-                debugprint(f"Error generating combinations: {str(e)}")
-                return jsonify({"error": "Failed to generate valid combinations. Please check your course selections."}), 400
-
-            if not all_combinations:
-                return jsonify({"error": "No valid combinations could be generated"}), 400
-
-            # STEP 1: Check exam conflicts
-            debugprint("\n=== STEP 1: Checking Exam Conflicts ===")
-            combinations_without_exam_conflicts = []
-            for combination in all_combinations:
-                # Validate combination structure
-                if not all(isinstance(section, dict) and "courseCode" in section for section in combination):
-                    debugprint("Invalid section found in combination, skipping...")
-                    continue
+            compat = snapshot.compat
+            selected_days = {day.upper() for day in days}
+
+            # STEP 1: Reduce each course to the sections that fit the day/time
+            # preferences; these checks only look at one section at a time
+            debugprint("\n=== STEP 1: Applying Day/Time Preferences ===")
+            preferred_domains = []
+            rejections = {}
+            preference_filtered = False
+            for domain in domains:
+                kept, reasons = filter_sections_by_preferences(domain, times, selected_days)
+                stats.prune("preferences", len(domain) - len(kept))
+                preference_filtered = preference_filtered or len(kept) < len(domain)
+                preferred_domains.append(kept)
+                if not kept:
+                    rejections.setdefault(domain[0].course_code, reasons)
+
+            # Branch once per distinct schedule. The same course twice in one
+            # request compares sections by faculty and sectionId, so keep
+            # those requests uncollapsed.
+            if len({domain[0].course_code for domain in domains}) == len(domains):
+                collapsed = [collapse_equivalent_sections(domain) for domain in preferred_domains]
+                stats.prune("equivalent", sum(map(len, preferred_domains)) - sum(map(len, collapsed)))
+                preferred_domains = collapsed
+                domains = [collapse_equivalent_sections(domain) for domain in domains]
+
+            # STEP 2: Search combinations free of exam and time conflicts,
+            # lazily and in the same order as itertools.product
+            debugprint("\n=== STEP 2: Searching Exam and Time Compatible Combinations ===")
+            both = CompatibilityMatrix.TIME | CompatibilityMatrix.EXAM
+            # Drop sections that can't be in any routine; an emptied course
+            # means there is nothing to search
+            fitting_domains = preferred_domains
+            reduced, preferred_conflict = arc_consistency(preferred_domains, compat, both)
+            preferred_domains = reduced if reduced is not None else [[] for _ in preferred_domains]
+            if optimize:
+                mode = "rank"
+            elif use_ai:
+                mode = "all"
+            else:
+                mode = "first"
+            combinations_count, routines_estimate = estimate_search(preferred_domains, compat, both)
+            engine = choose_search_engine(combinations_count, routines_estimate, mode)
+            search_info = {
+                "engine": engine,
+                "combinations": combinations_count,
+                "estimatedRoutines": round(routines_estimate, 1),
+            }
+            trace("Search estimate: %s", search_info)
 
-                has_exam_conflicts, exam_error = check_exam_compatibility(combination)
-                if has_exam_conflicts:
-                    debugprint(f"✗ Exam conflict found: {exam_error}")
-                    # Format the error message for the frontend's ExamConflictMessage component
-                    affected_courses = [section["courseCode"] for section in combination]
-                    error_msg = f"Exam Conflicts\nAffected Courses: {', '.join(affected_courses)}\n{exam_error}"
-                    return jsonify({"error": error_msg}), 200
-                combinations_without_exam_conflicts.append(combination)
-
-            if not combinations_without_exam_conflicts:
-                return jsonify({"error": "No valid combinations found without exam conflicts"}), 200
-
-            # STEP 2: Check time conflicts
-            debugprint("\n=== STEP 2: Checking Time Conflicts ===")
-            valid_combinations = []
-            for combination in combinations_without_exam_conflicts:
-                if is_valid_combination(combination):
-                    valid_combinations.append(combination)
-
-            if not valid_combinations:
-                return jsonify({"error": "No valid combinations found without time conflicts"}), 200
-
-            # STEP 3: Check day/time preferences
-            debugprint("\n=== STEP 3: Checking Day/Time Preferences ===")
             final_combinations = []
-            for combination in valid_combinations:
-                all_sections_valid = True
-                for section in combination:
-                    # Check if section schedules fit within selected times
-                    valid_time, error = filter_section_by_time(section, times)
-                    if not valid_time:
-                        debugprint(f"✗ Time conflict: {error}")
-                        all_sections_valid = False
-                        break
-
-                    # Check if section days are in selected days
-                    section_days = set()
-                    if section.get("sectionSchedule") and section["sectionSchedule"].get("classSchedules"):
-                        section_days.update(schedule["day"].upper() 
-                            for schedule in section["sectionSchedule"]["classSchedules"])
-                    for lab in get_lab_schedules_flat(section):
-                        section_days.add(lab["day"].upper())
-                    
-                    if not all(day.upper() in [d.upper() for d in days] for day in section_days):
-                        debugprint(f"✗ Day conflict: {section.get('courseCode')} requires days not in selection")
-                        all_sections_valid = False
-                        break
-
-                if all_sections_valid:
-                    final_combinations.append(combination)
+            ranked = []
+            if mode == "rank":
+                if engine == "local_search":
+                    ranked = local_search_routines(
+                        preferred_domains, compat, top_k, days, times, commute_preference, stats, budget
+                    )
+                else:
+                    ranked = top_routines(
+                        preferred_domains, compat, top_k, days, times, commute_preference, stats, budget,
+                        exhaustive=engine == "exhaustive",
+                    )
+                final_combinations.extend(combination for _, combination in ranked)
+                stats.accepted = len(final_combinations)
+            elif mode == "all":
+                # The AI path wants the match with the fewest campus days ("far")
+                # or the most (otherwise); keep only the best one instead of a
+                # list of every match
+                if engine == "exhaustive":
+                    # Small enough to score every match; ties go to the first in product order
+                    best_days = None
+                    for combination in iter_product_combinations(preferred_domains, compat, both, stats, budget):
+                        stats.accepted += 1
+                        days_count, _ = calculate_campus_days(combination)
+                        if best_days is None or (
+                            days_count < best_days if commute_preference == "far" else days_count > best_days
+                        ):
+                            final_combinations[:] = [combination]
+                            best_days = days_count
+                else:
+                    best = campus_day_routine(preferred_domains, compat, commute_preference, stats, budget)
+                    if best is not None:
+                        final_combinations.append(best)
+            else:
+                # The manual path only needs one match: place the most constrained
+                # course first and try the most promising sections first
+                search = iter_combinations(
+                    preferred_domains,
+                    compat,
+                    both,
+                    stats,
+                    most_constrained=True,
+                    value_key=routine_value_key(commute_preference),
+                    budget=budget,
+                )
+                first = next(search, None)
+                if first is not None:
+                    final_combinations.append(first)
+                    stats.accepted = 1
+
+            def out_of_budget():
+                return jsonify({
+                    "error": "The routine search ran out of its search budget before finding a routine. Try fewer courses or sections.",
+                    "exhaustive": False,
+                    "stats": stats.as_dict(),
+                    "search": search_info,
+                }), 200
 
             if not final_combinations:
-                return jsonify({"error": "No combinations found that match your day and time preferences"}), 200
+                if budget.exhausted:
+                    return out_of_budget()
+                # The main search proved there is no routine. The searches below
+                # only choose the message, on their own budget; if they run out
+                # the generic preference or time-conflict message is used.
+                diagnosis = SearchBudget(DIAGNOSIS_TIME_BUDGET_SECONDS, DIAGNOSIS_NODE_BUDGET)
+                # Report the same cause as the old step-by-step checks:
+                # exam clashes first, then time conflicts, then preferences.
+                # Arc consistency settles most impossible requests without a search.
+                def explain(conflict, preferred_only=False):
+                    if not conflict:
+                        return ""
+                    codes = [domains[position][0].course_code for position in conflict]
+                    return "\n" + explain_incompatible_courses(codes, preferred_only)
+
+                reduced, conflict = arc_consistency(domains, compat, both)
+                compatible = None
+                # If the preferences removed nothing, the main search already
+                # covered these domains and found no routine
+                if reduced is not None and preference_filtered:
+                    compatible = next(iter_combinations(reduced, compat, both, budget=diagnosis), None)
+                if compatible is not None or diagnosis.exhausted:
+                    if rejections:
+                        course_code, reasons = next(iter(rejections.items()))
+                        return jsonify({"error": format_preference_rejections(course_code, reasons)}), 200
+                    message = "No combinations found that match your day and time preferences"
+                    return jsonify({"error": message + explain(preferred_conflict, preferred_only=True)}), 200
+                exam_reduced, _ = arc_consistency(domains, compat, CompatibilityMatrix.EXAM)
+                exam_free = None
+                if exam_reduced is not None:
+                    exam_free = next(
+                        iter_combinations(exam_reduced, compat, CompatibilityMatrix.EXAM, budget=diagnosis), None
+                    )
+                if exam_free is not None or diagnosis.exhausted:
+                    message = "No valid combinations found without time conflicts"
+                    return jsonify({"error": message + explain(conflict)}), 200
+                # Exams alone rule out every combination. Show the clashes of
+                # the routine the request would get if exams didn't matter
+                # (preferring one that fits the day/time preferences), so the
+                # message names the exams that actually block it
+                example = None
+                for candidates in (fitting_domains, domains):
+                    time_reduced, _ = arc_consistency(candidates, compat, CompatibilityMatrix.TIME)
+                    if time_reduced is not None:
+                        example = next(
+                            iter_combinations(time_reduced, compat, CompatibilityMatrix.TIME, budget=diagnosis), None
+                        )
+                    if example is not None:
+                        break
+                if example is None:
+                    # Every combination clashes, so the first one does too
+                    example = tuple(domain[0] for domain in domains)
+                exam_conflicts = [
+                    conflict
+                    for i, section1 in enumerate(example)
+                    for section2 in example[i + 1:]
+                    for conflict in check_exam_conflicts(section1, section2)
+                ]
+                exam_error = format_exam_conflicts_message(exam_conflicts)
+                trace("✗ Exam conflict found: %s", exam_error)
+                # Format the error message for the frontend's ExamConflictMessage component
+                involved = {code for conflict in exam_conflicts for code in (conflict["course1"], conflict["course2"])}
+                affected_courses = [section.course_code for section in example if section.course_code in involved]
+                error_msg = f"Exam Conflicts\nAffected Courses: {', '.join(affected_courses)}\n{exam_error}"
+                return jsonify({"error": error_msg}), 200
+
+            if optimize:
+                routines = [
+                    {"routine": [s.raw for s in combination], "score": score}
+                    for score, combination in ranked
+                ]
+                best_score, best_combination = ranked[0]
+                # Without a full search these are the best found before the budget ran out
+                ranking = {
+                    "routines": routines,
+                    # Local search never proves its routines are the best ones
+                    "exhaustive": not budget.exhausted and engine != "local_search",
+                    "stats": stats.as_dict(),
+                    "search": search_info,
+                }
+                if use_ai:
+                    return try_ai_routine_generation(
+                        [s.raw for s in best_combination], days, times, commute_preference, extra=ranking
+                    )
+                return jsonify({
+                    "routine": routines[0]["routine"],
+                    "score": best_score,
+                    **ranking,
+                }), 200
 
             # If using AI, pass to AI routine generation
             if use_ai:
                 debugprint("\n=== Using AI for Best Routine ===")
-                # Sort combinations by campus days based on commute preference
-                combinations_with_days = []
-                for combination in final_combinations:
-                    days_count, days_list = calculate_campus_days(combination)
-                    combinations_with_days.append({
-                        "combination": combination,
-                        "campus_days": days_count,
-                        "days_list": days_list
-                    })
-
-                # Sort based on commute preference
-                if commute_preference == "far":
-                    # For "Live Far", sort by ascending campus days (fewer days is better)
-                    combinations_with_days.sort(key=lambda x: x["campus_days"])
-                    debugprint("Sorted combinations by ascending campus days (fewer days is better)")
-                else:
-                    # For "Live Near" or no preference, sort by descending campus days (more days is better)
-                    combinations_with_days.sort(key=lambda x: x["campus_days"], reverse=True)
-                    debugprint("Sorted combinations by descending campus days (more days is better)")
-
-                # Use the best combination
-                best_combination = combinations_with_days[0]["combination"]
-                debugprint(f"Selected best combination with {combinations_with_days[0]['campus_days']} campus days: {', '.join(combinations_with_days[0]['days_list'])}")
-                return try_ai_routine_generation(best_combination, days, times, commute_preference)
+                best_combination = final_combinations[0]
+                if tracing():
+                    days_count, days_list = calculate_campus_days(best_combination)
+                    debugprint(f"Selected best combination with {days_count} campus days: {', '.join(days_list)}")
+                extra = {"search": search_info}
+                if budget.exhausted:
+                    # A search cut short by the budget only ranked what it found
+                    extra.update({"exhaustive": False, "stats": stats.as_dict()})
+                return try_ai_routine_generation(
+                    [s.raw for s in best_combination], days, times, commute_preference, extra=extra
+                )
 
             # Return the first valid combination
             debugprint("\n=== Using Manual Routine Generation ===")
-            return jsonify({"routine": final_combinations[0]}), 200
+            return jsonify({"routine": [s.raw for s in final_combinations[0]], "search": search_info}), 200
 
     except Exception as e:
         debugprint(f"Error in generate_routine: {str(e)}")
         return jsonify({"error": "An error occurred while generating the routine"}), 500
+    finally:
+        if stats is not None:
+            stats.report()
 
-def try_ai_routine_generation(valid_combination, selected_days, selected_times, commute_preference):
-    """AI-assisted routine generation using Gemini AI."""
+def try_ai_routine_generation(valid_combination, selected_days, selected_times, commute_preference, extra=None):
+    """AI-assisted routine generation using Gemini AI. `extra` fields are added to the response."""
+    extra = extra or {}
     try:
         debugprint("\n=== Using AI for Best Routine ===")
         
@@ -1650,7 +2612,7 @@ def try_ai_routine_generation(valid_combination, selected_days, selected_times,
         ai_available, message = check_ai_availability()
         if not ai_available:
             debugprint(f"AI not available: {message}")
-            return jsonify({"routine": valid_combination}), 200
+            return jsonify({"routine": valid_combination, **extra}), 200
 
         # Calculate routine score
         score = calculate_routine_score(valid_combination, selected_days, selected_times, commute_preference)
@@ -1665,12 +2627,13 @@ def try_ai_routine_generation(valid_combination, selected_days, selected_times,
         return jsonify({
             "routine": valid_combination,
             "score": score,
-            "feedback": feedback
+            "feedback": feedback,
+            **extra,
         }), 200
 
     except Exception as e:
         debugprint(f"Error in AI routine generation: {e}")
-        return jsonify({"routine": valid_combination}), 200
+        return jsonify({"routine": valid_combination, **extra}), 200
 
 def get_routine_feedback_for_api(routine, commute_preference=None):
     """Get AI feedback for a routine."""
@@ -1741,39 +2704,19 @@ def auto_fix_json(s):
 
 def format24(time_str):
     # Converts "8:00 AM" to "08:00:00"
-    debugprint(f"Converting to 24-hour format: {time_str}")
-    try:
-        dt = datetime.strptime(time_str.strip(), "%I:%M %p")
-        result = dt.strftime("%H:%M:%S")
-        debugprint(f"Converted {time_str} to {result} (24-hour format)")
-        return result
-    except Exception as e:
-        debugprint(f"Error converting to 24-hour format: {e}")
+    parsed = parse_time_of_day(time_str)
+    if parsed is None:
+        trace("Could not convert %s to 24-hour format", time_str)
         return time_str
+    return "%02d:%02d:%02d" % parsed
 
 
 def timeToMinutes(tstr):
     # Accepts "08:00:00" or "8:00 AM"
     if not tstr:
-        debugprint(f"Warning: Empty time string")
-        return 0
-
-    tstr = tstr.strip()
-    debugprint(f"Converting time to minutes: {tstr}")
-    try:
-        if "AM" in tstr or "PM" in tstr:
-            dt = datetime.strptime(tstr, "%I:%M %p")
-            minutes = dt.hour * 60 + dt.minute
-            debugprint(f"Converted {tstr} to {minutes} minutes (12-hour format)")
-            return minutes
-        else:
-            dt = datetime.strptime(tstr, "%H:%M:%S")
-            minutes = dt.hour * 60 + dt.minute
-            debugprint(f"Converted {tstr} to {minutes} minutes (24-hour format)")
-            return minutes
-    except Exception as e:
-        debugprint(f"Error converting time to minutes: {e}")
+        trace("Warning: Empty time string")
         return 0
+    return _minutes_or_zero(tstr)
 
 
 @app.route("/api/ask_ai", methods=["POST"])
@@ -1900,15 +2843,19 @@ def check_time_conflicts_ai():
             debugprint("❌ No routine provided for analysis")
             return jsonify({"error": "No routine provided for analysis"}), 400
 
-        debugprint(f"Checking {len(routine)} sections for time conflicts")
+        trace("Checking %s sections for time conflicts", len(routine))
 
         # Check for time conflicts
         time_conflicts = []
+        compiled = [as_section(section) for section in routine]
         for i in range(len(routine)):
             section1 = routine[i]
             for j in range(i + 1, len(routine)):
                 section2 = routine[j]
-                debugprint(f"\nComparing {section1.get('courseCode')} with {section2.get('courseCode')}")
+                # Disjoint week masks rule out every pairing below
+                if not compiled[i].may_conflict_with(compiled[j]):
+                    continue
+                trace("\nComparing %s with %s", section1.get('courseCode'), section2.get('courseCode'))
 
                 # Check class schedules
                 debugprint("Checking class-class conflicts...")
@@ -1921,7 +2868,7 @@ def check_time_conflicts_ai():
                             end2 = TimeUtils.time_to_minutes(sched2.get("endTime"))
 
                             if schedules_overlap(start1, end1, start2, end2):
-                                debugprint(f"❌ Found class-class conflict on {sched1.get('day')}")
+                                trace("❌ Found class-class conflict on %s", sched1.get('day'))
                                 time_conflicts.append({
                                     "type": "class-class",
                                     "course1": section1.get("courseCode"),
@@ -1942,7 +2889,7 @@ def check_time_conflicts_ai():
                             end2 = TimeUtils.time_to_minutes(lab2.get("endTime"))
 
                             if schedules_overlap(start1, end1, start2, end2):
-                                debugprint(f"❌ Found lab-lab conflict on {lab1.get('day')}")
+                                trace("❌ Found lab-lab conflict on %s", lab1.get('day'))
                                 time_conflicts.append({
                                     "type": "lab-lab",
                                     "course1": section1.get("courseCode"),
@@ -1964,7 +2911,7 @@ def check_time_conflicts_ai():
                             end2 = TimeUtils.time_to_minutes(sched2.get("endTime"))
 
                             if schedules_overlap(start1, end1, start2, end2):
-                                debugprint(f"❌ Found lab-class conflict on {lab1.get('day')}")
+                                trace("❌ Found lab-class conflict on %s", lab1.get('day'))
                                 time_conflicts.append({
                                     "type": "lab-class",
                                     "course1": section1.get("courseCode"),
@@ -1985,7 +2932,7 @@ def check_time_conflicts_ai():
                             end2 = TimeUtils.time_to_minutes(lab2.get("endTime"))
 
                             if schedules_overlap(start1, end1, start2, end2):
-                                debugprint(f"❌ Found class-lab conflict on {sched1.get('day')}")
+                                trace("❌ Found class-lab conflict on %s", sched1.get('day'))
                                 time_conflicts.append({
                                     "type": "class-lab",
                                     "course1": section1.get("courseCode"),
@@ -2015,7 +2962,7 @@ def check_time_conflicts_ai():
 
             return jsonify({"has_conflicts": False, "analysis": analysis}), 200
         else:
-            debugprint(f"\n❌ Found {len(time_conflicts)} time conflicts")
+            trace("\n❌ Found %s time conflicts", len(time_conflicts))
             # Format the conflicts for the AI to analyze
             conflicts_text = "\n".join(
                 [
@@ -2068,24 +3015,27 @@ def get_exam_schedule():
     if not course_code or not section_name:
         return jsonify({"error": "Missing courseCode or sectionName"}), 400
 
+    snapshot = catalog.get()
+    if snapshot is None:
+        return jsonify({"error": "Failed to load course data. Please try again later."}), 503
+
     # Find the section in the data
-    for section in data:
-        if section.get("courseCode") == course_code and str(
-            section.get("sectionName")
-        ) == str(section_name):
-            # Return only the exam fields
-            return jsonify(
-                {
-                    "courseCode": section.get("courseCode"),
-                    "sectionName": section.get("sectionName"),
-                    "midExamDate": section.get("midExamDate"),
-                    "midExamStartTime": section.get("midExamStartTime"),
-                    "midExamEndTime": section.get("midExamEndTime"),
-                    "finalExamDate": section.get("finalExamDate"),
-                    "finalExamStartTime": section.get("finalExamStartTime"),
-                    "finalExamEndTime": section.get("finalExamEndTime"),
-                }
-            )
+    compiled = snapshot.by_course_section.get((course_code, str(section_name)))
+    if compiled is not None:
+        section = compiled.raw
+        # Return only the exam fields
+        return jsonify(
+            {
+                "courseCode": section.get("courseCode"),
+                "sectionName": section.get("sectionName"),
+                "midExamDate": section.get("midExamDate"),
+                "midExamStartTime": section.get("midExamStartTime"),
+                "midExamEndTime": section.get("midExamEndTime"),
+                "finalExamDate": section.get("finalExamDate"),
+                "finalExamStartTime": section.get("finalExamStartTime"),
+                "finalExamEndTime": section.get("finalExamEndTime"),
+            }
+        )
     return jsonify({"error": "Section not found"}), 404
 
 
@@ -2095,14 +3045,6 @@ def calculate_routine_score(
     """Calculate a score for a routine combination based on various factors."""
     score = 0
 
-    # Convert selected times to minutes for easier comparison
-    time_ranges = []
-    for time_slot in selected_times:
-        start, end = time_slot.split("-")
-        start_mins = TimeUtils.time_to_minutes(start.strip())
-        end_mins = TimeUtils.time_to_minutes(end.strip())
-        time_ranges.append((start_mins, end_mins))
-
     # Score factors
     day_distribution = {day: [] for day in selected_days}  # Track classes per day
     gaps = []  # Track gaps between classes
@@ -2110,36 +3052,15 @@ def calculate_routine_score(
     late_classes = 0  # Count of late afternoon classes
 
     for section in combination:
-        # Process class schedules
-        if section.get("sectionSchedule") and section["sectionSchedule"].get(
-            "classSchedules"
-        ):
-            for schedule in section["sectionSchedule"]["classSchedules"]:
-                day = schedule.get("day", "").upper()
-                if day in day_distribution:
-                    start_time = TimeUtils.time_to_minutes(
-                        schedule.get("startTime", "")
-                    )
-                    end_time = TimeUtils.time_to_minutes(schedule.get("endTime", ""))
-                    day_distribution[day].append((start_time, end_time))
-
-                    # Check timing preferences
-                    if start_time < 540:  # Before 9:00 AM
-                        early_classes += 1
-                    if end_time > 960:  # After 4:00 PM
-                        late_classes += 1
-
-        # Process lab schedules
-        for lab in get_lab_schedules_flat(section):
-            day = lab.get("day", "").upper()
-            if day in day_distribution:
-                start_time = TimeUtils.time_to_minutes(lab.get("startTime", ""))
-                end_time = TimeUtils.time_to_minutes(lab.get("endTime", ""))
-                day_distribution[day].append((start_time, end_time))
+        # Class and lab meetings are scored the same way
+        for meeting in as_section(section).meetings:
+            if meeting.day in day_distribution:
+                day_distribution[meeting.day].append((meeting.start, meeting.end))
 
-                if start_time < 540:
+                # Check timing preferences
+                if meeting.start < 540:  # Before 9:00 AM
                     early_classes += 1
-                if end_time > 960:
+                if meeting.end > 960:  # After 4:00 PM
                     late_classes += 1
 
     # Calculate scores for different factors
@@ -2190,76 +3111,227 @@ def calculate_routine_score(
     return score
 
 
+class ScoreBound:
+    """Upper bound on calculate_routine_score for a partly built routine."""
+
+    def __init__(self, domains, selected_days, commute_preference):
+        self.selected = set(selected_days)
+        self.commute_preference = commute_preference
+        # Per course: {course_index: (early, late, days)} for its candidates
+        self.features = [
+            {section.course_index: self._features(section) for section in domain}
+            for domain in domains
+        ]
+
+    def _features(self, section):
+        early = late = 0
+        days = set()
+        for meeting in section.meetings:
+            if meeting.day in self.selected:
+                days.add(meeting.day)
+                if meeting.start < 540:  # Before 9:00 AM
+                    early += 1
+                if meeting.end > 960:  # After 4:00 PM
+                    late += 1
+        return early, late, frozenset(days)
+
+    def __call__(self, chosen, alive):
+        early = late = 0
+        days = set()
+        open_features = []
+        for position, section in enumerate(chosen):
+            features = self.features[position]
+            if section is not None:
+                section_early, section_late, section_days = features[section.course_index]
+                early += section_early
+                late += section_late
+                days |= section_days
+            else:
+                bits = alive[position]
+                open_features.append([f for index, f in features.items() if bits >> index & 1])
+
+        early_range = [early, early]
+        late_range = [late, late]
+        reachable_days = set(days)
+        forced_new_days = 0
+        for candidates in open_features:
+            early_range[0] += min(f[0] for f in candidates)
+            early_range[1] += max(f[0] for f in candidates)
+            late_range[0] += min(f[1] for f in candidates)
+            late_range[1] += max(f[1] for f in candidates)
+            forced_new_days = max(forced_new_days, min(len(f[2] - days) for f in candidates))
+            for f in candidates:
+                reachable_days |= f[2]
+
+        bound = 0
+        if self.commute_preference == "early":
+            bound += (5 - late_range[0]) * 2
+        elif self.commute_preference == "late":
+            bound += (5 - early_range[0]) * 2
+        else:
+            # Closest |early - late| the open courses could still reach
+            spread = max(0, early_range[0] - late_range[1], late_range[0] - early_range[1])
+            bound += -spread * 2
+
+        if self.commute_preference == "far":
+            bound += (len(self.selected) - len(days) - forced_new_days) * 10
+        elif self.commute_preference == "near":
+            if len(reachable_days) == len(self.selected):
+                bound += 1000
+            else:
+                bound -= (len(self.selected) - len(reachable_days)) * 50
+        return bound
+
+
+def top_routines(
+    domains, compat, count, selected_days, selected_times, commute_preference, stats=None, budget=None,
+    exhaustive=False,
+):
+    """Return up to `count` (score, combination) pairs with the best calculate_routine_score, best first."""
+    bound = ScoreBound(domains, selected_days, commute_preference)
+    kept = []  # min-heap of (score, -found, combination)
+
+    def prune(chosen, alive):
+        return len(kept) == count and bound(chosen, alive) <= kept[0][0]
+
+    both = CompatibilityMatrix.TIME | CompatibilityMatrix.EXAM
+    if exhaustive:
+        search = iter_product_combinations(domains, compat, both, stats, budget)
+    else:
+        search = iter_combinations(
+            domains,
+            compat,
+            both,
+            stats,
+            most_constrained=True,
+            value_key=routine_value_key(commute_preference),
+            prune=prune,
+            budget=budget,
+        )
+    for found, combination in enumerate(search):
+        score = calculate_routine_score(combination, selected_days, selected_times, commute_preference)
+        entry = (score, -found, combination)
+        if len(kept) < count:
+            heapq.heappush(kept, entry)
+        elif entry[:2] > kept[0][:2]:
+            heapq.heapreplace(kept, entry)
+    return [(score, combination) for score, _, combination in sorted(kept, key=lambda e: e[:2], reverse=True)]
+
+
+def campus_day_routine(domains, compat, commute_preference, stats=None, budget=None):
+    """Return the routine with the fewest campus days ("far") or the most (otherwise), or None."""
+    fewest = commute_preference == "far"
+    # Per course: {course_index: days} for its candidates
+    days_of = [{section.course_index: section.days for section in domain} for domain in domains]
+    best = [None, None]  # days, combination
+
+    def bound(chosen, alive):
+        days = set()
+        open_days = []
+        for position, section in enumerate(chosen):
+            if section is not None:
+                days |= section.days
+            else:
+                bits = alive[position]
+                open_days.append([d for index, d in days_of[position].items() if bits >> index & 1])
+        if fewest:
+            # Every open course still has to add at least its cheapest candidate's new days
+            return len(days) + max((min(len(d - days) for d in candidates) for candidates in open_days), default=0)
+        for candidates in open_days:
+            for d in candidates:
+                days |= d
+        return len(days)
+
+    def prune(chosen, alive):
+        if best[0] is None:
+            return False
+        limit = bound(chosen, alive)
+        return limit >= best[0] if fewest else limit <= best[0]
+
+    def order(placed):
+        used_days = set()
+        for section in placed:
+            used_days |= section.days
+        weight = 1 if fewest else -1
+        return lambda section: weight * len(section.days - used_days)
+
+    search = iter_combinations(
+        domains,
+        compat,
+        CompatibilityMatrix.TIME | CompatibilityMatrix.EXAM,
+        stats,
+        most_constrained=True,
+        value_key=order,
+        prune=prune,
+        budget=budget,
+    )
+    # The bound is exact once every course is placed, so each routine yielded beats the last
+    for combination in search:
+        if stats is not None:
+            stats.accepted += 1
+        days_count, _ = calculate_campus_days(combination)
+        best[:] = [days_count, combination]
+    return best[1]
+
+
+def routine_value_key(commute_preference):
+    """Section ordering for the search, loosely following calculate_routine_score."""
+    if commute_preference == "far":
+        day_weight = 1
+    elif commute_preference == "near":
+        day_weight = -1
+    else:
+        day_weight = 0
+
+    def order(placed):
+        # Everything about the placed sections is worked out once per search node
+        used_days = set()
+        placed_meetings = {}
+        for other in placed:
+            used_days |= other.days
+            for other_meeting in other.meetings:
+                placed_meetings.setdefault(other_meeting.day, []).append(other_meeting)
+
+        def key(section):
+            gap_hours = 0
+            for meeting in section.meetings:
+                nearest = None
+                for other_meeting in placed_meetings.get(meeting.day, ()):
+                    gap = max(meeting.start - other_meeting.end, other_meeting.start - meeting.end, 0)
+                    nearest = gap if nearest is None else min(nearest, gap)
+                if nearest is not None and nearest > 30:  # same threshold as the gap score
+                    gap_hours += nearest / 60
+            return (day_weight * len(section.days - used_days), gap_hours)
+
+        return key
+
+    return order
+
+
 def get_days_used_in_routine(routine):
     """Get a list of unique days used in the routine."""
-    debugprint("\nGetting days used in routine")
     days_used = set()
     for section in routine:
-        debugprint(f"\nProcessing section {section.get('courseCode')} {section.get('sectionName')}")
-        # Check class schedules
-        if section.get("sectionSchedule") and section["sectionSchedule"].get("classSchedules"):
-            debugprint("Processing class schedules")
-            for sched in section["sectionSchedule"]["classSchedules"]:
-                if sched.get("day"):
-                    day = sched["day"].upper()
-                    days_used.add(day)
-                    debugprint(f"Added class day: {day}")
-        
-        # Check lab schedules
-        if section.get("labSchedules"):
-            debugprint("Processing lab schedules")
-            if isinstance(section["labSchedules"], list):
-                for lab in section["labSchedules"]:
-                    if lab.get("day"):
-                        day = lab["day"].upper()
-                        days_used.add(day)
-                        debugprint(f"Added lab day: {day}")
-            elif isinstance(section["labSchedules"], dict) and section["labSchedules"].get("classSchedules"):
-                for lab_schedule in section["labSchedules"]["classSchedules"]:
-                    if lab_schedule.get("day"):
-                        day = lab_schedule["day"].upper()
-                        days_used.add(day)
-                        debugprint(f"Added lab day: {day}")
-    
+        days_used.update(as_section(section).days)
+
     days_list = sorted(list(days_used))
-    debugprint(f"Total days used: {len(days_list)}")
-    debugprint(f"Days: {', '.join(days_list)}")
+    trace("Total days used: %s", len(days_list))
+    trace("Days: %s", ", ".join(days_list))
     return days_list
 
 
 def calculate_campus_days(combination):
     """Calculate the total number of unique days a student needs to be on campus."""
-    debugprint("\nCalculating campus days for combination")
     days = set()
     for section in combination:
-        if not isinstance(section, dict):
-            debugprint(f"Warning: Invalid section format: {type(section)}")
+        if not isinstance(section, (dict, Section)):
+            trace("Warning: Invalid section format: %s", type(section))
             continue
-
-        debugprint(f"\nProcessing section {section.get('courseCode')} {section.get('sectionName')}")
-        # Check class schedules
-        section_schedule = section.get("sectionSchedule", {})
-        if isinstance(section_schedule, dict):
-            class_schedules = section_schedule.get("classSchedules", [])
-            if isinstance(class_schedules, list):
-                debugprint("Processing class schedules")
-                for schedule in class_schedules:
-                    if isinstance(schedule, dict) and schedule.get("day"):
-                        day = schedule["day"].upper()
-                        days.add(day)
-                        debugprint(f"Added class day: {day}")
-
-        # Check lab schedules using the normalized helper function
-        debugprint("Processing lab schedules")
-        for lab_schedule in get_lab_schedules_flat(section):
-            if isinstance(lab_schedule, dict) and lab_schedule.get("day"):
-                day = lab_schedule["day"].upper()
-                days.add(day)
-                debugprint(f"Added lab day: {day}")
+        days.update(as_section(section).days)
 
     days_list = sorted(list(days))
-    debugprint(f"Total campus days: {len(days_list)}")
-    debugprint(f"Days: {', '.join(days_list)}")
+    trace("Total campus days: %s", len(days_list))
+    trace("Days: %s", ", ".join(days_list))
     return len(days), days_list
 
 
@@ -2267,7 +3339,7 @@ def calculate_campus_days(combination):
 def get_lab_schedules_flat(section):
     """Helper to normalize labSchedules to a flat array of schedules.
     Handles both old format (array of schedules) and new format (object with classSchedules)."""
-    debugprint(f"\nGetting flat lab schedules for section {section.get('courseCode')} {section.get('sectionName')}")
+    trace("\nGetting flat lab schedules for section %s %s", section.get('courseCode'), section.get('sectionName'))
     labSchedules = section.get("labSchedules")
     if not labSchedules:
         debugprint("No lab schedules found")
@@ -2284,9 +3356,9 @@ def get_lab_schedules_flat(section):
             }
             for schedule in labSchedules
         ]
-        debugprint(f"Found {len(schedules)} lab schedules")
+        trace("Found %s lab schedules", len(schedules))
         for schedule in schedules:
-            debugprint(f"Lab schedule: {schedule.get('day')} {schedule.get('startTime')}-{schedule.get('endTime')} in {schedule.get('room')}")
+            trace("Lab schedule: %s %s-%s in %s", schedule.get('day'), schedule.get('startTime'), schedule.get('endTime'), schedule.get('room'))
         return schedules
 
     # Handle new format: object with classSchedules array
@@ -2300,12 +3372,12 @@ def get_lab_schedules_flat(section):
             }
             for schedule in labSchedules["classSchedules"]
         ]
-        debugprint(f"Found {len(schedules)} lab schedules")
+        trace("Found %s lab schedules", len(schedules))
         for schedule in schedules:
-            debugprint(f"Lab schedule: {schedule.get('day')} {schedule.get('startTime')}-{schedule.get('endTime')} in {schedule.get('room')}")
+            trace("Lab schedule: %s %s-%s in %s", schedule.get('day'), schedule.get('startTime'), schedule.get('endTime'), schedule.get('room'))
         return schedules
 
-    debugprint(f"Warning: Unrecognized lab schedule format: {type(labSchedules)}")
+    trace("Warning: Unrecognized lab schedule format: %s", type(labSchedules))
     return []
 
 
@@ -2319,7 +3391,7 @@ def convert_time_24_to_12(time_str):
         # Parse the time string
         time_parts = time_str.split(":")
         if len(time_parts) < 2:
-            debugprint(f"Warning: Invalid time format: {time_str}")
+            trace("Warning: Invalid time format: %s", time_str)
             return time_str
 
         hours = int(time_parts[0])
@@ -2332,11 +3404,11 @@ def convert_time_24_to_12(time_str):
             hours = 12
 
         result = f"{hours}:{minutes:02d} {period}"
-        debugprint(f"Converted {time_str} to {result}")
+        trace("Converted %s to %s", time_str, result)
         return result
 
     except Exception as e:
-        debugprint(f"Error converting time: {e}")
+        trace("Error converting time: %s", e)
         return time_str
 
 def format_section_times(section):
@@ -2378,24 +3450,7 @@ def format_section_times(section):
 def has_time_conflict(section1, section2):
     """Check if two sections have time conflicts."""
     try:
-        debugprint(f"\nChecking time conflicts between {section1.get('courseCode')} and {section2.get('courseCode')}")
-        
-        # Get all schedules for both sections
-        schedules1 = get_all_schedules(section1)
-        schedules2 = get_all_schedules(section2)
-        
-        # Check each pair of schedules
-        for sched1 in schedules1:
-            for sched2 in schedules2:
-                if not check_schedule_compatibility(sched1, sched2):
-                    debugprint(f"Found time conflict:")
-                    debugprint(f"Section 1: {section1.get('courseCode')} {sched1.get('day')} {sched1.get('startTime')}-{sched1.get('endTime')}")
-                    debugprint(f"Section 2: {section2.get('courseCode')} {sched2.get('day')} {sched2.get('startTime')}-{sched2.get('endTime')}")
-                    return True
-        
-        debugprint("No time conflicts found")
-        return False
-
+        return as_section(section1).conflicts_with(as_section(section2))
     except Exception as e:
         debugprint(f"Error checking time conflicts: {e}")
         return True  # Return True to be safe if there's an error